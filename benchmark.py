@@ -0,0 +1,265 @@
+"""Reproducible benchmarks of the model's hot paths, compared against a stored baseline.
+
+Run `python benchmark.py --save` to record a baseline, then `python benchmark.py` to
+flag operations that got slower or allocate more than the baseline allows.
+"""
+# pylint: disable=invalid-name
+from __future__ import annotations
+import argparse
+from dataclasses import dataclass, field
+from functools import partial
+import json
+import os
+from pathlib import Path
+import platform
+import random
+import sys
+import tracemalloc
+from time import perf_counter
+from typing import Callable, Iterator
+
+from clock import SimulationClock
+from controls import BooleanVariable, NumericVariable
+from objects import Chart, Person
+from region import resolve_regions
+from simulation import (SCREEN_WIDTH, SCREEN_HEIGHT, SETTINGS_WIDTH, ArraySimulation,
+                        Simulation, set_up_layout)
+
+
+SIZES = (200, 2_000, 20_000, 200_000)
+SAMPLES = 200  # people whose operations are timed at each population size
+ARRAY_STEPS = 10  # steps of the vectorized engine timed per pass
+MIN_TIME = 0.2  # seconds each repeat runs for, in whole passes over the operations
+BASELINE_PATH = "benchmark_baseline.json"
+
+
+@dataclass(slots=True)
+class Workload:
+    """Operations timed together, and how to restore any state they change."""
+    operations: list[Callable[[], object]]
+    reset: Callable[[], None] = field(default=lambda: None)
+
+
+class Scenario:
+    """A seeded population with the neighbor lists of a sample of its people."""
+    def __init__(self, size: int, seed: int):
+        self.size, self.seed = size, seed
+        _, region_dict, _, community_dict = set_up_layout()
+        self.simulation = Simulation(region_dict["Field"], community_dict,
+                                     NumericVariable("distancing percent", 100),
+                                     NumericVariable("distancing strength", 1),
+                                     BooleanVariable("distancing", True),
+                                     BooleanVariable("communities", True),
+                                     BooleanVariable("travel", True), size, seed=seed)
+        self.simulation.neighbors.rebuild(self.simulation.persons)
+        self.sample: list[Person] = random.Random(seed).sample(self.simulation.persons.sprites(),
+                                                               min(size, SAMPLES))
+        self.nears = [person.get_nearby(self.simulation.neighbors) for person in self.sample]
+
+
+def get_nearby(scenario: Scenario) -> Workload:
+    """Neighbor queries through the spatial hash."""
+    return Workload([partial(person.get_nearby, scenario.simulation.neighbors)
+                     for person in scenario.sample])
+
+
+def social_distance(scenario: Scenario) -> Workload:
+    """Repulsion from every nearby person."""
+    directions = [person.direction.copy() for person in scenario.sample]
+
+    def reset():
+        for person, direction in zip(scenario.sample, directions):
+            person.direction = direction.copy()
+    return Workload([partial(person.social_distance, nears)
+                     for person, nears in zip(scenario.sample, scenario.nears)], reset)
+
+
+def spread(scenario: Scenario) -> Workload:
+    """Transmission attempts from infected people to those nearby."""
+    affected = {other for nears in scenario.nears for other in nears}
+    affected.update(scenario.sample)
+    snapshot = [(person, person.state, person.infected_start, person.infected_end,
+                 person.last_event, person.distancing) for person in affected]
+    streams, scheduler = scenario.simulation.streams, scenario.simulation.scheduler
+    stream_state = streams.getstate()
+    # infections schedule events, which would pile up over passes
+    heap, deferred, people = (list(scheduler.heap), list(scheduler.deferred),
+                              dict(scheduler.people))
+
+    def reset():
+        streams.setstate(stream_state)
+        scheduler.heap[:], scheduler.deferred[:] = heap, deferred
+        scheduler.people = dict(people)
+        for (person, state, infected_start, infected_end,
+             last_event, distancing) in snapshot:
+            person.state, person.distancing = state, distancing
+            person.infected_start, person.infected_end = infected_start, infected_end
+            person.last_event = last_event
+    return Workload([partial(person.spread, nears)
+                     for person, nears in zip(scenario.sample, scenario.nears)], reset)
+
+
+def array_step(scenario: Scenario) -> Workload:
+    """Whole steps of the vectorized engine with as many people, one infected in a
+    hundred and distancing off, restarted from the same seed on every pass."""
+    _, region_dict, _, community_dict = set_up_layout()
+    current: list[ArraySimulation] = []
+
+    def reset():
+        simulation = ArraySimulation(region_dict["Field"], community_dict,
+                                     NumericVariable("distancing percent", 100),
+                                     NumericVariable("distancing strength", 1),
+                                     BooleanVariable("distancing", False),
+                                     BooleanVariable("communities", True),
+                                     BooleanVariable("travel", True), scenario.size,
+                                     seed=scenario.seed)
+        for _ in range(max(1, scenario.size // 100)):
+            simulation.infect_one()
+        current[:] = [simulation]
+
+    def step():
+        current[0].step(1/60)
+    return Workload([step]*ARRAY_STEPS, reset)
+
+
+def chart_update(scenario: Scenario) -> Workload:
+    """Chart snapshots of the population's state counts, one per update interval."""
+    clock = SimulationClock()
+    chart = Chart((410, 410), (205, 205),
+                  tuple((str(state), state.value) for state in Person.State), clock)
+    counts = scenario.simulation.counts()
+
+    def update():
+        clock.advance(Chart.update_interval)
+        chart.update(counts)
+    return Workload([update]*SAMPLES)
+
+
+def get_color(_: Scenario) -> Workload:
+    """Network line colors across the whole intensity range."""
+    return Workload([partial(Person.gradient.get_color, value) for value in range(256)])
+
+
+def region_layout(_: Scenario) -> Workload:
+    """Screen layout into field and settings regions."""
+    layout = ((SCREEN_WIDTH-SETTINGS_WIDTH, "Field"), (SETTINGS_WIDTH, "Settings"))
+    return Workload([partial(resolve_regions, (SCREEN_WIDTH, SCREEN_HEIGHT), layout, 10)]
+                    * SAMPLES)
+
+
+# benchmarks timed at every population size, then those independent of it
+SCALED_BENCHMARKS = {"get_nearby": get_nearby,
+                     "social_distance": social_distance,
+                     "spread": spread,
+                     "array_step": array_step}
+FIXED_BENCHMARKS = {"chart_update": chart_update,
+                    "get_color": get_color,
+                    "resolve_regions": region_layout}
+
+
+def run_pass(workload: Workload) -> float:
+    """Run every operation once from the same starting state, returning the time taken."""
+    workload.reset()
+    start = perf_counter()
+    for operation in workload.operations:
+        operation()
+    return perf_counter() - start
+
+
+def measure(workload: Workload, repeats: int) -> dict[str, float]:
+    """Best-of-`repeats` operations per second, and peak memory allocated by one pass."""
+    rates = []
+    for _ in range(repeats):
+        elapsed, passes = 0.0, 0
+        while elapsed < MIN_TIME:
+            elapsed += run_pass(workload)
+            passes += 1
+        rates.append(passes*len(workload.operations)/elapsed)
+    tracemalloc.start()
+    try:
+        run_pass(workload)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    workload.reset()
+    return {"ops_per_sec": max(rates), "peak_bytes": peak}
+
+
+def run_benchmarks(sizes: tuple[int, ...] = SIZES, seed: int = 0, repeats: int = 3,
+                   only: set[str] | None = None) -> Iterator[tuple[str, dict[str, float]]]:
+    """Yield (benchmark key, measurement) for each benchmark, keyed `name[size]` for
+    those that scale with the population."""
+    def selected(benchmarks: dict[str, Callable[[Scenario], Workload]]):
+        return {name: setup for name, setup in benchmarks.items()
+                if only is None or name in only}
+
+    for size in sizes:
+        if scaled := selected(SCALED_BENCHMARKS):
+            scenario = Scenario(size, seed)
+            for name, setup in scaled.items():
+                yield (f"{name}[{size}]", measure(setup(scenario), repeats))
+            del scenario
+    if fixed := selected(FIXED_BENCHMARKS):
+        scenario = Scenario(min(sizes, default=SIZES[0]), seed)
+        for name, setup in fixed.items():
+            yield (name, measure(setup(scenario), repeats))
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]],
+            tolerance: float = 0.2) -> list[str]:
+    """Describe each benchmark that is more than `tolerance` slower or more memory
+    hungry than its baseline."""
+    regressions = []
+    for key, result in results.items():
+        if (reference := baseline.get(key)) is None:
+            continue
+        if result["ops_per_sec"] < reference["ops_per_sec"]*(1-tolerance):
+            regressions.append(f"{key}: {result['ops_per_sec']:.1f} ops/s, "
+                               f"baseline {reference['ops_per_sec']:.1f} ops/s")
+        if result["peak_bytes"] > reference["peak_bytes"]*(1+tolerance):
+            regressions.append(f"{key}: peak {result['peak_bytes']:.0f} B, "
+                               f"baseline {reference['peak_bytes']:.0f} B")
+    return regressions
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """Run the benchmarks, then save them as the baseline or check them against it."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--only", nargs="+", choices=[*SCALED_BENCHMARKS, *FIXED_BENCHMARKS])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--output", help="also write results to this file")
+    options = parser.parse_args(arguments)
+
+    results = {}
+    for key, result in run_benchmarks(tuple(options.sizes), options.seed, options.repeats,
+                                      set(options.only) if options.only else None):
+        results[key] = result
+        print(f"{key:<28}{result['ops_per_sec']:>14.1f} ops/s"
+              f"{result['peak_bytes']/1024:>12.1f} KiB peak")
+    report = {"seed": options.seed, "python": platform.python_version(),
+              "machine": platform.machine(), "results": results}
+    if options.output:
+        Path(options.output).write_text(json.dumps(report, indent=2))
+    if options.save:
+        Path(options.baseline).write_text(json.dumps(report, indent=2))
+        return 0
+    if not os.path.exists(options.baseline):
+        print(f"no baseline at {options.baseline}; run with --save to create one")
+        return 0
+    baseline = json.loads(Path(options.baseline).read_text())
+    if baseline.get("seed") != options.seed:
+        print("warning: baseline was recorded with a different seed")
+    if regressions := compare(results, baseline["results"], options.tolerance):
+        print("regressions:", *regressions, sep="\n  ")
+        return 1
+    print("no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
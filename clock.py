@@ -0,0 +1,24 @@
+"""Simulation time keeping."""
+
+
+class SimulationClock:
+    """Model time that only moves when advanced, usable in place of `perf_counter`.
+
+    Time is computed from a count of equal steps rather than summed step by step, so
+    float error does not build up over long runs.
+    """
+    def __init__(self, start: float = 0.0):
+        self.time = start
+        self.base = start  # time when the current step size took effect
+        self.step = 0.0
+        self.steps = 0
+
+    def __call__(self) -> float:
+        return self.time
+
+    def advance(self, step: float):
+        """Move the clock forward by a simulation step in seconds."""
+        if step != self.step:
+            self.base, self.step, self.steps = self.time, step, 0
+        self.steps += 1
+        self.time = self.base + self.steps*self.step
@@ -1,13 +1,43 @@
 """Interactive elements for parameter and event control."""
 # pylint: disable=invalid-name,no-member
-from functools import cache
+from functools import cache, lru_cache
 
 import pygame
 
 
-pygame.font.init()
-font = pygame.font.SysFont("arial", 20, False)
 TEXT_COLOR = (255, 255, 255)
+TEXT_CACHE_SIZE = 512  # rendered strings and glyphs kept for reuse
+
+
+@cache
+def get_font() -> pygame.font.Font:
+    """Get the interface font, initializing the font module on first use."""
+    pygame.font.init()
+    return pygame.font.SysFont("arial", 20, False)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text: str, color: tuple[int, int, int] = TEXT_COLOR) -> pygame.Surface:
+    """Render text in the interface font, reusing the surfaces of recent strings."""
+    return get_font().render(text, True, color)
+
+
+def blit_text(target: pygame.Surface, position: tuple[int, int], *parts: str,
+              color: tuple[int, int, int] = TEXT_COLOR) -> pygame.Rect:
+    """Draw strings side by side from cached surfaces and return the area covered.
+
+    Pass changing values as single characters, e.g. `blit_text(screen, at, "people: ",
+    *str(count))`, so they are composed from a few cached glyphs instead of rendering
+    every new value.
+    """
+    x, y = position
+    height = 0
+    for part in parts:
+        surface = render_text(part, color)
+        target.blit(surface, (x, y))
+        x += surface.get_width()
+        height = max(height, surface.get_height())
+    return pygame.Rect(position, (x-position[0], height))
 
 
 def clamp(value: int | float, minimum: int | float, maximum: int | float) -> int | float:
@@ -74,6 +104,7 @@ class Button(pygame.sprite.Sprite):
     padding = 5
     def __init__(self, label: str, center: tuple[int, int], event: int):
         super().__init__()
+        font = get_font()
         self.label = font.render(label, True, TEXT_COLOR)
         self.size = (self.label.get_width() + 2*self.padding,
                      font.get_height() + 2*self.padding)
@@ -82,12 +113,19 @@ class Button(pygame.sprite.Sprite):
         adjusted_center = (center[0] + int(self.size[0]/2), center[1])
         self.rect = self.surf.get_rect(center=adjusted_center, size=self.size)
         self.event = event
+        self.pressed: bool | None = None  # pressed state last drawn
+        self.dirty = True  # whether the last update changed the surface
 
     def update(self, mouse_buttons: tuple[bool, bool, bool],
                mouse_position: tuple[int, int]):
         """Draw the button and handle interactions."""
+        pressed = bool(self.rect.collidepoint(mouse_position) and mouse_buttons[0])
+        self.dirty = pressed != self.pressed
+        if not self.dirty:
+            return
+        self.pressed = pressed
         self.surf.fill((0, 0, 0, 0))
-        if self.rect.collidepoint(mouse_position) and mouse_buttons[0]:
+        if pressed:
             self.surf.fill(self.active_color)
         pygame.draw.rect(self.surf, self.border_color,
                          pygame.Rect((0, 0), self.size), self.border_thickness)
@@ -96,7 +134,6 @@ class Button(pygame.sprite.Sprite):
 
 class Checkbox(pygame.sprite.Sprite):
     """Checkbox bound to a boolean variable."""
-    width = font.get_height()
     border_color = (255, 255, 255)
     active_color = (128, 128, 128, 255)
     inactive_color = (0, 0, 0, 0)
@@ -104,6 +141,8 @@ class Checkbox(pygame.sprite.Sprite):
     def __init__(self, label: str, center: tuple[int, int],
                  variable: Variable, active: bool = False):
         super().__init__()
+        font = get_font()
+        self.width = font.get_height()
         self.label = font.render(label, True, TEXT_COLOR)
         self.size = (self.width + self.label.get_width() + 30, self.width)
         self.center = center
@@ -115,9 +154,15 @@ class Checkbox(pygame.sprite.Sprite):
         self.variable = variable
         self.active = active
         self.box_surf.fill(self.active_color if self.active else self.inactive_color)
+        self.drawn_active: bool | None = None  # active state last drawn
+        self.dirty = True  # whether the last update changed the surface
 
     def update(self):
         """Draw the checkbox and handle interactions."""
+        self.dirty = self.active != self.drawn_active
+        if not self.dirty:
+            return
+        self.drawn_active = self.active
         self.surf.fill(self.inactive_color)
         pygame.draw.rect(self.surf, self.border_color,
                          pygame.Rect((0, 0), (self.width, self.width)), self.border_thickness)
@@ -142,6 +187,7 @@ class Slider(pygame.sprite.Sprite):
     def __init__(self, label: str, center: tuple[int, int],
                  variable: Variable, scale: tuple[int, int], decimals: int = 0):
         super().__init__()
+        font = get_font()
         self.label = font.render(f"{label}=", True, TEXT_COLOR)
         self.scale = scale
         self.decimals = decimals
@@ -160,11 +206,13 @@ class Slider(pygame.sprite.Sprite):
                     * (self.width-self.box_width))
         self.box_rect = pygame.Rect((position, 0), (self.box_width, font.get_height()))
         self.initial = True
+        self.drawn: tuple | None = None  # box position, box color and value last drawn
+        self.dirty = True  # whether the last update changed the surface
 
     def update(self, mouse_position: tuple[int, int],
                mouse_down: tuple):
         """Draw the slider and handle interactions."""
-        self.surf.fill((0, 0, 0, 0))
+        font = get_font()
         box_color = self.inactive_box_color
         if mouse_down[0] and self.rect.collidepoint(*mouse_down):
             if self.initial:
@@ -179,14 +227,19 @@ class Slider(pygame.sprite.Sprite):
                 )  # type: ignore
             if not self.decimals:
                 self.variable.value = int(self.variable.value)  # type: ignore
+        value = (round(self.variable.value, self.decimals)
+                 if self.decimals else int(self.variable.value))
+        self.dirty = (self.box_rect.left, box_color, value) != self.drawn
+        if not self.dirty:
+            return
+        self.drawn = (self.box_rect.left, box_color, value)
+        self.surf.fill((0, 0, 0, 0))
         pygame.draw.line(self.surf, self.bar_color, (0, self.size[1]/2),
                          (self.width, self.size[1]/2), self.bar_thickness)
         pygame.draw.rect(self.surf, box_color, self.box_rect)
         self.surf.blit(self.label, (self.width + font.get_height()/2, 0))
-        value = (round(self.variable.value, self.decimals)
-                 if self.decimals else int(self.variable.value))
-        value_text = font.render(str(value), True, TEXT_COLOR)
-        self.surf.blit(value_text, (self.width + self.label.get_width() + font.get_height()/2, 0))
+        self.surf.blit(render_text(str(value)),
+                       (self.width + self.label.get_width() + font.get_height()/2, 0))
 
     @staticmethod
     @cache
@@ -0,0 +1,88 @@
+"""Monte Carlo ensembles of seeded headless runs across worker processes."""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+from objects import Person
+from simulation import model_parameters, run_headless
+
+
+STATES = tuple(str(state) for state in Person.State)
+
+
+@dataclass(slots=True)
+class Replicate:
+    """Result of a single seeded run."""
+    index: int
+    seed: int
+    series: dict[str, list[float]]
+
+
+def replicate_seeds(seed: int, replicates: int) -> list[int]:
+    """Derive independent per-replicate seeds from a base seed."""
+    return [int(child.generate_state(1)[0])
+            for child in np.random.SeedSequence(seed).spawn(replicates)]
+
+
+def run_replicate(index: int, seed: int, duration: float,
+                  parameters: dict[str, float], options: dict[str, Any]) -> Replicate:
+    """Run one replicate with overridden model constants. Executed in a worker process."""
+    with model_parameters(**parameters):
+        return Replicate(index, seed, run_headless(duration, seed=seed, **options))
+
+
+def run_ensemble(replicates: int, duration: float, seed: int = 0,
+                 parameters: dict[str, float] | None = None, max_workers: int | None = None,
+                 **options) -> Iterator[Replicate]:
+    """Run seeded replicates on a process pool, yielding each one as soon as it finishes.
+
+    `parameters` overrides model constants (see `model_parameters`); any other keyword
+    arguments are passed to `run_headless`. Uses every core unless `max_workers` is set.
+    If iteration stops early, replicates that have not started are cancelled and those
+    already running finish in the background without blocking the caller.
+    """
+    executor = ProcessPoolExecutor(max_workers)
+    try:
+        futures = [executor.submit(run_replicate, index, replicate_seed, duration,
+                                   parameters or {}, options)
+                   for index, replicate_seed in enumerate(replicate_seeds(seed, replicates))]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class EnsembleSummary:
+    """Per-sample percentiles of state counts across replicates, updated as they arrive."""
+    def __init__(self, percentiles: tuple[float, ...] = (5, 25, 50, 75, 95)):
+        self.percentiles = percentiles
+        self.replicates: list[Replicate] = []
+
+    def add(self, replicate: Replicate):
+        """Include a finished replicate."""
+        self.replicates.append(replicate)
+
+    def extend(self, replicates: Iterable[Replicate]):
+        """Include several finished replicates."""
+        for replicate in replicates:
+            self.add(replicate)
+
+    @property
+    def time(self) -> np.ndarray:
+        """Sample times shared by every replicate."""
+        length = min(len(replicate.series["time"]) for replicate in self.replicates)
+        return np.asarray(self.replicates[0].series["time"][:length])
+
+    def summarize(self) -> dict[str, np.ndarray]:
+        """Get a (percentile, sample) array of counts for each state."""
+        if not self.replicates:
+            raise ValueError("no replicates to summarize")
+        length = min(len(replicate.series["time"]) for replicate in self.replicates)
+        return {state: np.percentile(
+                    np.array([replicate.series[state][:length]
+                              for replicate in self.replicates]),
+                    self.percentiles, axis=0)
+                for state in STATES}
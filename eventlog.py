@@ -0,0 +1,133 @@
+"""Buffered, columnar log of infection state transitions."""
+from __future__ import annotations
+from array import array
+import os
+import queue
+import struct
+import threading
+from typing import BinaryIO
+
+
+MAGIC = b"EPIDEMIC-EVENTS\x01"
+COUNT = struct.Struct("<I")
+NO_SOURCE = -1  # source id for transitions without a transmitting person
+
+FIELDS = ("time", "person_id", "from_state", "to_state", "source_id")
+TYPECODES = ("d", "q", "b", "b", "q")
+
+
+class EventLog:
+    """Record (time, person_id, from_state, to_state, source_id) transitions.
+
+    Events are appended to in-memory columns. Every `chunk_size` events the columns
+    are handed to a background thread that writes them to the sink. At most
+    `max_pending` chunks wait for the writer, so memory stays bounded and a slow
+    sink applies backpressure instead of growing the buffer. If writing fails, the
+    writer keeps draining the queue so nothing blocks, and the error is raised from
+    the next `flush` (and so the next `record` that fills a chunk) or `close`.
+
+    A file holds `MAGIC` followed by chunks, each an unsigned 32-bit event count and
+    then every column's values back to back in native byte order.
+    """
+    def __init__(self, sink: str | os.PathLike | BinaryIO,
+                 chunk_size: int = 4096, max_pending: int = 16):
+        self.owns_sink = isinstance(sink, (str, os.PathLike))
+        self.sink: BinaryIO = open(sink, "wb") if self.owns_sink else sink  # type: ignore
+        self.sink.write(MAGIC)
+        self.chunk_size = chunk_size
+        self.columns = self.new_columns()
+        self.pending: queue.Queue[tuple[array, ...] | None] = queue.Queue(max_pending)
+        self.error: Exception | None = None  # first failure of the writer thread
+        self.writer = threading.Thread(target=self.write_chunks, name="event-log", daemon=True)
+        self.writer.start()
+        self.closed = False
+
+    @staticmethod
+    def new_columns() -> tuple[array, ...]:
+        """Create empty columns for a chunk."""
+        return tuple(array(typecode) for typecode in TYPECODES)
+
+    def record(self, time: float, person_id: int, from_state: int, to_state: int,
+               source_id: int = NO_SOURCE):
+        """Append one transition."""
+        times, person_ids, from_states, to_states, source_ids = self.columns
+        times.append(time)
+        person_ids.append(person_id)
+        from_states.append(from_state)
+        to_states.append(to_state)
+        source_ids.append(source_id)
+        if len(times) >= self.chunk_size:
+            self.flush()
+
+    def record_many(self, times, person_ids, from_states, to_states, source_ids):
+        """Append a batch of transitions from equal-length sequences or arrays."""
+        for column, values, typecode in zip(self.columns,
+                                            (times, person_ids, from_states,
+                                             to_states, source_ids), TYPECODES):
+            if hasattr(values, "astype"):  # NumPy arrays convert without a Python loop
+                column.frombytes(values.astype(column.typecode).tobytes())
+            else:
+                column.extend(array(typecode, values))
+        if len(self.columns[0]) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Hand buffered events to the writer thread."""
+        if self.error is not None:
+            raise self.error
+        if len(self.columns[0]):
+            self.pending.put(self.columns)
+            self.columns = self.new_columns()
+
+    def write_chunks(self):
+        """Write queued chunks to the sink until told to stop, discarding them after
+        a failed write."""
+        while (chunk := self.pending.get()) is not None:
+            if self.error is not None:
+                continue
+            try:
+                self.sink.write(COUNT.pack(len(chunk[0])))
+                for column in chunk:
+                    self.sink.write(column.tobytes())
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                self.error = error
+
+    def close(self):
+        """Flush remaining events, stop the writer and release the sink."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.flush()
+        finally:
+            self.pending.put(None)
+            self.writer.join()
+            try:
+                if self.error is None:
+                    self.sink.flush()
+            finally:
+                if self.owns_sink:
+                    self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self) -> EventLog:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def read_event_log(source: str | os.PathLike | BinaryIO) -> dict[str, array]:
+    """Read a log written by `EventLog` back into columns keyed by field name."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return read_event_log(file)
+    if source.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not an event log")
+    columns = {field: array(typecode) for field, typecode in zip(FIELDS, TYPECODES)}
+    while header := source.read(COUNT.size):
+        (count,) = COUNT.unpack(header)
+        for column in columns.values():
+            column.frombytes(source.read(count * column.itemsize))
+    return columns
@@ -1,33 +1,35 @@
 """Color gradient with color stops."""
-from functools import cache
-from itertools import pairwise
+import numpy as np
 
 
 RGBTuple = tuple[int, int, int]
 
 
 class Gradient:
-    """Handle gradient transitions."""
-    def __init__(self, *args: tuple[int, RGBTuple]):
+    """Handle gradient transitions.
+
+    The stops are compiled into a table of `size` colors spanning the first to the last
+    stop, so looking up a color is a single index for one value or an array of them.
+    """
+    def __init__(self, *args: tuple[int, RGBTuple], size: int = 256):
         self.colors: tuple[tuple[int, RGBTuple], ...] = tuple(sorted(args))
+        positions = [position for position, _ in self.colors]
+        self.low, self.high = positions[0], positions[-1]
+        self.step = (size-1)/(self.high-self.low)  # table entries per unit of value
+        values = np.linspace(self.low, self.high, size)
+        self.table = np.column_stack(
+            [np.interp(values, positions, channel)
+             for channel in zip(*(color for _, color in self.colors))]
+            ).astype(np.uint8)
+        self.table.flags.writeable = False
+        self.rgb: list[RGBTuple] = [tuple(row) for row in self.table.tolist()]  # type: ignore
 
-    def get_color(self, value: int | float) -> tuple[int, int, int]:
+    def get_color(self, value: int | float) -> RGBTuple:
         """Get a color for a particular value based on color stop configuration."""
-        active_lower, active_upper = next((lower, upper) for lower, upper in pairwise(self.colors)
-                                          if value in range(lower[0], upper[0]+1))
-        return self._process_value(active_lower, active_upper, value)
+        index = int((value-self.low)*self.step + 0.5)
+        return self.rgb[min(max(index, 0), len(self.rgb)-1)]
 
-    @staticmethod
-    @cache
-    def _process_value(lower: tuple[int, RGBTuple],
-                       upper: tuple[int, RGBTuple], value: int | float):
-        """Get color value for a given position between two color stops."""
-        min_value, lower_color = lower
-        max_value, upper_color = upper
-        percentage = (value - min_value)/(max_value - min_value)
-        delta = (upper_color[0]-lower_color[0],
-                 upper_color[1]-lower_color[1],
-                 upper_color[2]-lower_color[2])
-        return (int(lower_color[0]+delta[0]*percentage),
-                int(lower_color[1]+delta[1]*percentage),
-                int(lower_color[2]+delta[2]*percentage))
+    def get_colors(self, values: np.ndarray) -> np.ndarray:
+        """Get an (N, 3) array of colors for an array of values."""
+        indices = np.floor((np.asarray(values)-self.low)*self.step + 0.5).astype(np.intp)
+        return self.table[np.clip(indices, 0, len(self.table)-1)]
@@ -1,28 +1,33 @@
 """Execution of the model."""
 # pylint: disable=no-name-in-module,no-member,invalid-name,redefined-outer-name
 from __future__ import annotations
-from itertools import cycle
-import random
-from time import perf_counter
 from typing import Protocol
 
 import pygame
-from pygame.locals import KEYDOWN, QUIT, K_ESCAPE, MOUSEBUTTONDOWN, MOUSEBUTTONUP
+from pygame.locals import KEYDOWN, QUIT, K_ESCAPE, K_F3, MOUSEBUTTONDOWN, MOUSEBUTTONUP
 
-from controls import font, TEXT_COLOR, Button, BooleanVariable, Checkbox, NumericVariable, Slider
-from objects import TRAVEL_INTERVAL, Region, Community, Bounds, Person, Chart
-from region import RegionBlueprint, resolve_regions
+from controls import (get_font, blit_text, Button, BooleanVariable, Checkbox,
+                      NumericVariable, Slider)
+from eventlog import EventLog
+from objects import Community, Chart
+from profiler import FrameProfiler
+from render import DirtyRects, PopulationRenderer, StaticLayer
+from simulation import SCREEN_WIDTH, SCREEN_HEIGHT, ENGINES, ArraySimulation, set_up_layout
 
 # https://www.youtube.com/watch?v=gxAaO2rsdIs
 
 
 pygame.init()
+font = get_font()
 
-SCREEN_WIDTH, SCREEN_HEIGHT = (1920, 1080)
-FULL_WIDTH, FULL_HEIGHT = (SCREEN_WIDTH*5, SCREEN_HEIGHT*5)
-SETTINGS_WIDTH = 450
 FRAMERATE = 120
-DEFAULT_PERSON_COUNT = 200
+SIMULATION_STEP = 1/60  # fixed simulation timestep in seconds
+MAX_STEPS_PER_FRAME = 8  # drop simulation backlog beyond this to stay responsive
+EVENT_LOG_PATH: str | None = None  # file to record state transitions to, if any
+PROFILE_TRACE_PATH: str | None = None  # .csv or .json file for per-frame phase timings
+SEED: int | None = None  # seed for every random stream, to replay a session's randomness
+SOFTWARE_DISPLAY = False  # unscaled window presenting only changed areas, for slow displays
+ENGINE = "sprites"  # "arrays" for the vectorized population; draws people without overlays
 
 BACKGROUND_COLOR = (0, 0, 0)
 
@@ -34,34 +39,9 @@ REMOVE_TEN_PEOPLE = pygame.USEREVENT + 2
 INFECT_ONE_PERSON = pygame.USEREVENT + 3
 RANDOMIZE_DISTANCERS = pygame.USEREVENT + 4
 RANDOMIZE_FORCE_DISPLAY = pygame.USEREVENT + 5
-TRAVEL_ONE_PERSON = pygame.USEREVENT + 6
-pygame.time.set_timer(TRAVEL_ONE_PERSON, int(1000*TRAVEL_INTERVAL))
-
 ADJUST_DISTANCING_PERCENT = pygame.USEREVENT + 7
 
 
-def set_up_regions(
-        new_regions: list[RegionBlueprint]
-        ) -> tuple[pygame.sprite.Group, dict[str, Region]]:
-    """Generate and organize regions in pygame."""
-    regions, region_dict = pygame.sprite.Group(), {}
-    for blueprint in new_regions:
-        region = Region(blueprint.size, blueprint.center, blueprint.label)
-        regions.add(region)
-        region_dict[blueprint.label] = region
-    return (regions, region_dict)
-
-def set_up_communities(new_communities: list[RegionBlueprint],
-                       x_offset: int) -> tuple[pygame.sprite.Group, dict[str, Community]]:
-    """Generate and organize communities in pygame."""
-    communities, community_dict = pygame.sprite.Group(), {}
-    for blueprint in new_communities:
-        center = (blueprint.center[0]+10+x_offset, blueprint.center[1]+10)
-        community = Community(blueprint.size, center, blueprint.label)
-        communities.add(community)
-        community_dict[blueprint.label] = community
-    return (communities, community_dict)
-
 def set_up_buttons(new_buttons: tuple[tuple[str, int],...]) -> pygame.sprite.Group:
     """Generate and organize buttons in pygame."""
     buttons = pygame.sprite.Group()
@@ -80,49 +60,38 @@ def set_up_checkboxes(
         ) -> pygame.sprite.Group:
     """Generate and organize checkboxes in pygame."""
     checkboxes = pygame.sprite.Group()
+    checkbox_width = font.get_height()
     for i, (label, variable) in enumerate(new_checkboxes):
         checkboxes.add(
             Checkbox(label,
                      (settings.left_pad,
-                      settings.top_pad + int(Checkbox.width*0.5)
-                      + int((Checkbox.width+settings.padding)*i)),
+                      settings.top_pad + int(checkbox_width*0.5)
+                      + int((checkbox_width+settings.padding)*i)),
                      variable, variable.value)
             )
     return checkboxes
 
 
-# divide screenspace into field and settings regions
-new_regions: list[RegionBlueprint] = resolve_regions(
-    (SCREEN_WIDTH, SCREEN_HEIGHT),
-    ((SCREEN_WIDTH-SETTINGS_WIDTH, "Field"), (SETTINGS_WIDTH, "Settings")),
-    border_thickness=10
-    )
-regions, region_dict = set_up_regions(new_regions)
+regions, region_dict, communities, community_dict = set_up_layout()
 field, settings = region_dict["Field"], region_dict["Settings"]
 
-# create a square of maximum size centered in the field
-field_square_width: int = field.size[1]
-field_square_x_offset = int((field.size[0]-field.size[1])/2)
-# split into 4 squares
-new_communities: list[RegionBlueprint] = resolve_regions(
-    (field_square_width, field_square_width),
-    ((field_square_width // 2,
-      ((field_square_width // 2, "TL"), (field_square_width // 2, "BL"))),
-     (field_square_width // 2,
-      ((field_square_width // 2, "TR"), (field_square_width // 2, "BR")))),
-    border_thickness=10
-    )
-communities, community_dict = set_up_communities(new_communities, field_square_x_offset)
-top_left, bottom_left, top_right, bottom_right = (
-    community_dict["TL"], community_dict["BL"], community_dict["TR"], community_dict["BR"])
-community_cycler = cycle((top_left, top_right, bottom_right, bottom_left))
-
-persons = pygame.sprite.Group()
 distancing_percent = NumericVariable("distancing percent", 100, ADJUST_DISTANCING_PERCENT)
 distancing_strength = NumericVariable("distancing strength", 1)
-for _ in range(DEFAULT_PERSON_COUNT):
-    persons.add(Person(Bounds(next(community_cycler), field),
-                       distancing_percent, distancing_strength))
+directions_toggle = BooleanVariable("directions", False)
+network_toggle = BooleanVariable("network", False)
+distancing_toggle = BooleanVariable("distancing", False)
+communities_toggle = BooleanVariable("communities", True)
+traveling_toggle = BooleanVariable("travel", True)
+rendering_toggle = BooleanVariable("rendering", True)
+event_log = EventLog(EVENT_LOG_PATH) if EVENT_LOG_PATH else None
+simulation = ENGINES[ENGINE](field, community_dict, distancing_percent, distancing_strength,
+                             distancing_toggle, communities_toggle, traveling_toggle,
+                             event_log=event_log, seed=SEED)
+population_renderer = PopulationRenderer(field.rect)
+static_layer = StaticLayer((SCREEN_WIDTH, SCREEN_HEIGHT), regions.sprites(),
+                           communities.sprites(), communities_toggle, BACKGROUND_COLOR)
+profiler = FrameProfiler(budget=1/FRAMERATE, trace=PROFILE_TRACE_PATH is not None)
+show_profiler = False  # toggled with F3
 
 charts = pygame.sprite.Group()
 chart_size = settings.right_pad-settings.left_pad
@@ -132,7 +101,7 @@ chart_values = (("infected", (255, 0, 0)),
                 ("recovered", (100, 255, 100)),
                 ("susceptible", (255, 255, 255)),
                 ("deceased", (100, 100, 100)))
-main_chart = Chart((chart_size, chart_size), chart_center, chart_values)
+main_chart = Chart((chart_size, chart_size), chart_center, chart_values, simulation.clock)
 charts.add(main_chart)
 
 new_buttons = (("Add 10 People", ADD_TEN_PEOPLE),
@@ -141,16 +110,12 @@ new_buttons = (("Add 10 People", ADD_TEN_PEOPLE),
                ("Randomize Distancers", RANDOMIZE_DISTANCERS),)
 buttons = set_up_buttons(new_buttons)
 
-directions_toggle = BooleanVariable("directions", False)
-network_toggle = BooleanVariable("network", False)
-distancing_toggle = BooleanVariable("distancing", False)
-communities_toggle = BooleanVariable("communities", True)
-traveling_toggle = BooleanVariable("travel", True)
 new_checkboxes = (("Show Directions", directions_toggle),
                   ("Show Network", network_toggle),
                   ("Social Distance", distancing_toggle),
                   ("Enable Communities", communities_toggle),
-                  ("Enable Traveling", traveling_toggle))
+                  ("Enable Traveling", traveling_toggle),
+                  ("Render People", rendering_toggle))
 checkboxes = set_up_checkboxes(new_checkboxes)
 
 sliders = pygame.sprite.Group()
@@ -166,6 +131,7 @@ class Blitable(Protocol):
     """Sprite protocol to circumvent `pygame.sprite.Group()` type hinting."""
     surf: pygame.Surface
     rect: pygame.Rect
+    dirty: bool
 
 
 class Point:
@@ -184,146 +150,139 @@ class Point:
         return (self.x, self.y)
 
 
-clock, frametime, start_time = pygame.time.Clock(), 0, perf_counter()
+clock, frametime, accumulator = pygame.time.Clock(), 0, 0.0
 running, mouse_down = True, (None, None)
-canvas = pygame.display.set_mode((FULL_WIDTH, FULL_HEIGHT))
-screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+if SOFTWARE_DISPLAY:
+    # SCALED presents the whole texture on every update, so use a plain software surface,
+    # fullscreen only where the display already matches the layout
+    native = pygame.display.get_desktop_sizes()[0]
+    screen = pygame.display.set_mode(
+        (SCREEN_WIDTH, SCREEN_HEIGHT),
+        pygame.FULLSCREEN if native == (SCREEN_WIDTH, SCREEN_HEIGHT) else 0)
+else:
+    # draw at layout resolution; SDL scales to the native display and maps mouse positions
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT),
+                                     pygame.FULLSCREEN | pygame.SCALED)
+dirty_rects = DirtyRects(screen.get_rect(), enabled=SOFTWARE_DISPLAY)
 
 while running:
     mouse_buttons = pygame.mouse.get_pressed()
     mouse_position = pygame.mouse.get_pos()
 
     # handle events
-    for event in pygame.event.get():
-        if event.type == KEYDOWN and event.key == K_ESCAPE:
-            running = False
-        elif event.type == MOUSEBUTTONDOWN:
-            mouse_down = mouse_position
-            if event.button == 1:
-                if field.rect.collidepoint(*mouse_position):
-                    if communities_toggle.value:
-                        if (hovered_community := next(
+    with profiler.phase("events"):
+        for event in pygame.event.get():
+            if event.type == KEYDOWN and event.key == K_ESCAPE:
+                running = False
+            elif event.type == KEYDOWN and event.key == K_F3:
+                show_profiler = not show_profiler
+                dirty_rects.invalidate()
+            elif event.type == MOUSEBUTTONDOWN:
+                mouse_down = mouse_position
+                if event.button == 1:
+                    if field.rect.collidepoint(*mouse_position):
+                        hovered_community: Community | None = next(
                             (community for community in communities
-                             if community.rect.collidepoint(*mouse_position)), None)):
-                            community = hovered_community
-                    persons.add(
-                        Person(Bounds(community, field),
-                               distancing_percent=distancing_percent,
-                               distancing_strength=distancing_strength,
-                               center=mouse_position)
-                        )
-                for checkbox in checkboxes:
-                    checkbox: Checkbox
-                    if checkbox.rect.collidepoint(*mouse_position):
-                        checkbox.toggle()
-                        if checkbox.variable is distancing_toggle:
-                            main_chart.mark_event(DISTANCING_EVENT_COLOR)
-                        elif checkbox.variable is traveling_toggle:
-                            main_chart.mark_event(TRAVELING_EVENT_COLOR)
-                for button in buttons:
-                    button: Button
-                    if button.rect.collidepoint(*mouse_position):
-                        pygame.event.post(pygame.event.Event(button.event))
-        elif event.type == MOUSEBUTTONUP:
-            mouse_down = (None, None)
-        elif event.type == ADD_TEN_PEOPLE:
-            for _ in range(10):
-                persons.add(
-                    Person(Bounds(next(community_cycler), field),
-                           distancing_percent=distancing_percent,
-                           distancing_strength=distancing_strength)
-                    )
-        elif event.type == REMOVE_TEN_PEOPLE:
-            for _ in range(min(len(persons), 10)):
-                if communities_toggle.value:
-                    while True:
-                        community = next(community_cycler)
-                        remove_pool = [person for person in persons
-                                       if person.active_bounds == community]
-                        if remove_pool:
-                            break
-                else:
-                    remove_pool = persons.sprites()
-                person = random.choice(remove_pool)
-                person.kill()
-        elif event.type == INFECT_ONE_PERSON:
-            infectible = [person for person in persons
-                          if person.state in {Person.State.SUSCEPTIBLE, Person.State.RECOVERED}]
-            person: Person = random.choice(infectible)
-            person.get_infected()
-        elif event.type == RANDOMIZE_DISTANCERS:
-            for person in persons:
-                person.distancing = False
-            target = int(distancing_percent.value/100 * len(persons))
-            new_distancers = random.sample(persons.sprites(), k=target)
-            for person in new_distancers:
-                person.distancing = True
-        elif event.type == TRAVEL_ONE_PERSON:
-            if communities_toggle.value and traveling_toggle.value:
-                person = random.choice(persons.sprites())
-                target_community: Community = random.choice(
-                    [community for community in communities
-                    if community is not person.bounds.community]
-                    )
-                person.start_traveling(target_community)
-        elif event.type == ADJUST_DISTANCING_PERCENT:
-            target = int(distancing_percent.value/100 * len(persons))
-            distancers = [person for person in persons if person.distancing]
-            non_distancers = [person for person in persons if not person.distancing]
-            if (diff := target - len(distancers)):
-                population, distancing = ((non_distancers, True) if diff > 0
-                                          else (distancers, False))
-                change_distancing: list[Person] = random.sample(population, k=abs(diff))
-                for person in change_distancing:
-                    person.distancing = distancing
-            distancing_percent.resolve_diff()
-        elif event.type == QUIT:
-            running = False
+                             if community.rect.collidepoint(*mouse_position)), None)
+                        simulation.add_person(hovered_community if communities_toggle.value
+                                              else None, center=mouse_position)
+                    for checkbox in checkboxes:
+                        checkbox: Checkbox
+                        if checkbox.rect.collidepoint(*mouse_position):
+                            checkbox.toggle()
+                            dirty_rects.invalidate()
+                            if checkbox.variable is distancing_toggle:
+                                main_chart.mark_event(DISTANCING_EVENT_COLOR)
+                            elif checkbox.variable is traveling_toggle:
+                                main_chart.mark_event(TRAVELING_EVENT_COLOR)
+                    for button in buttons:
+                        button: Button
+                        if button.rect.collidepoint(*mouse_position):
+                            pygame.event.post(pygame.event.Event(button.event))
+            elif event.type == MOUSEBUTTONUP:
+                mouse_down = (None, None)
+            elif event.type == ADD_TEN_PEOPLE:
+                simulation.add_people(10)
+            elif event.type == REMOVE_TEN_PEOPLE:
+                simulation.remove_people(10)
+            elif event.type == INFECT_ONE_PERSON:
+                simulation.infect_one()
+            elif event.type == RANDOMIZE_DISTANCERS:
+                simulation.randomize_distancers()
+            elif event.type == ADJUST_DISTANCING_PERCENT:
+                simulation.adjust_distancing()
+            elif event.type == QUIT:
+                running = False
+
+    # advance the simulation in fixed steps, independent of render speed
+    with profiler.phase("simulation"):
+        accumulator += frametime
+        steps = 0
+        while accumulator >= SIMULATION_STEP and steps < MAX_STEPS_PER_FRAME:
+            simulation.step(SIMULATION_STEP)
+            accumulator -= SIMULATION_STEP
+            steps += 1
+        accumulator = min(accumulator, SIMULATION_STEP)
+        interpolation = accumulator / SIMULATION_STEP
 
     # update sprites
-    regions.update()
-    for community in communities:
-        community: Community
-        community.active = communities_toggle.value
-        community.update()
-    persons.update(persons, frametime, directions_toggle, network_toggle, distancing_toggle)
-    chart_data = {str(state): len([person for person in persons if person.state == state])
-                  for state in Person.State}
-    charts.update(chart_data)  # data = dict of counts of infection states
-    buttons.update(mouse_buttons, mouse_position)
-    checkboxes.update()
-    sliders.update(mouse_position, mouse_down)
-
-    # draw bg
-    canvas.fill(BACKGROUND_COLOR)
+    if rendering_toggle.value:
+        with profiler.phase("people"):
+            if isinstance(simulation, ArraySimulation):
+                population_renderer.draw_population(simulation.population, interpolation)
+            else:
+                population_renderer.draw(simulation.persons, interpolation,
+                                         directions_toggle, network_toggle)
+    with profiler.phase("charts"):
+        chart_data = simulation.counts()
+        charts.update(chart_data)  # data = dict of counts of infection states
+    with profiler.phase("controls"):
+        buttons.update(mouse_buttons, mouse_position)
+        checkboxes.update()
+        sliders.update(mouse_position, mouse_down)
+
+    # draw background, regions and communities
+    with profiler.phase("layout"):
+        screen.blit(static_layer.get(), (0, 0))
 
     # draw sprites
-    labels = (("timer", round(perf_counter()-start_time, 1)),
-              ("people", len(persons)),
-              ("distancers", len([person for person in persons if person.distancing])),
-              ("susceptible", len([person for person in persons
-                                   if person.state == Person.State.SUSCEPTIBLE])),
-              ("infected", len([person for person in persons
-                                if person.state == Person.State.INFECTED])),
-              ("recovered", len([person for person in persons
-                                 if person.state == Person.State.RECOVERED])),
-              ("deceased", len([person for person in persons
-                                if person.state == Person.State.DECEASED])))
-    for i, data in enumerate(labels):
-        label = font.render(f"{data[0]}: {str(data[1])}", True, TEXT_COLOR)
-        field.surf.blit(label, Point(*field.get_corner("TL")).move(0, 40*i).tuple)
-    mouse_label = font.render(f"({mouse_position[0]}, {mouse_position[1]})", True, TEXT_COLOR)
-    field.surf.blit(mouse_label, Point(*field.get_corner("BL")).move(0, 0).tuple)
-
-    groups = [regions, persons, charts, buttons, checkboxes, sliders]
-    if communities_toggle.value:
-        groups.insert(1, communities)
-    for group in groups:
-        for sprite in group:
-            sprite: Blitable
-            canvas.blit(sprite.surf, sprite.rect)
-    scaled = pygame.transform.scale(canvas, (SCREEN_WIDTH, SCREEN_HEIGHT))
-    screen.blit(scaled, scaled.get_rect())
-
-    pygame.display.flip()
+    with profiler.phase("labels"):
+        labels = (("timer", round(simulation.clock(), 1)),
+                  ("people", len(simulation)),
+                  ("distancers", simulation.distancers()),
+                  *chart_data.items())
+        field_corner = Point(*field.rect.topleft)
+        for i, data in enumerate(labels):
+            label_rect = blit_text(
+                screen, field_corner.move(*field.get_corner("TL")).move(0, 40*i).tuple,
+                f"{data[0]}: ", *str(data[1]))
+            dirty_rects.track(("label", i), label_rect, data)
+        mouse_label_rect = blit_text(screen, field_corner.move(*field.get_corner("BL")).tuple,
+                                     *f"({mouse_position[0]}, {mouse_position[1]})")
+        dirty_rects.track("mouse label", mouse_label_rect, mouse_position)
+
+    with profiler.phase("blit"):
+        if rendering_toggle.value:
+            screen.blit(population_renderer.layer, population_renderer.area)
+            dirty_rects.add(*population_renderer.dirty)
+        for group in (charts, buttons, checkboxes, sliders):
+            for sprite in group:
+                sprite: Blitable
+                screen.blit(sprite.surf, sprite.rect)
+                if sprite.dirty:
+                    dirty_rects.add(sprite.rect)
+        if show_profiler:
+            overlay = profiler.get_overlay()
+            dirty_rects.track("profiler", screen.blit(overlay, main_chart.rect.topleft), overlay)
+    with profiler.phase("flip"):  # includes SDL scaling to the display
+        if dirty_rects.enabled:
+            pygame.display.update(dirty_rects.pop())
+        else:
+            pygame.display.flip()
+    profiler.end_frame()
     frametime = float(clock.tick(FRAMERATE)/1000)
+
+if event_log:
+    event_log.close()
+if PROFILE_TRACE_PATH:
+    profiler.write_trace(PROFILE_TRACE_PATH)
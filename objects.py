@@ -3,15 +3,19 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from enum import Enum
-from functools import cache, reduce
-import random
-from time import perf_counter
+from functools import lru_cache
+import heapq
 from typing import Literal
 
+import numpy as np
 import pygame
 
-from controls import font, TEXT_COLOR, clamp, NumericVariable, Variable
+from clock import SimulationClock
+from controls import get_font, TEXT_COLOR, clamp, NumericVariable, Variable
+from eventlog import NO_SOURCE, EventLog
 from gradient import Gradient
+from rng import RandomStreams
+from spatial import SpatialHash
 
 
 MAX_INFECTION_DURATION = 60
@@ -31,6 +35,13 @@ TRAVEL_SPEED_MULTIPLIER = 3  # movement speed traveling between communities
 
 PROXIMITY_COEFFICIENT = 10  # maximum repulsion force multiplier for closer proximity
 
+INTENSITY_RESOLUTION = 4  # network intensity lookup entries per pixel of distance
+
+# columns of a person's random draws for a step, movement then infection (see `rng.DrawPool`);
+# the infection columns are only drawn for people who poll infection without a scheduler
+TURN, TURN_ANGLE, BOUNCE, BOUNCE_ANGLE, SPREAD, TERMINATION = range(6)
+MOVEMENT_DRAWS, INFECTION_DRAWS = 4, 2
+
 
 class Region(pygame.sprite.Sprite):
     """Generic bounding region."""
@@ -44,10 +55,17 @@ class Region(pygame.sprite.Sprite):
         self.surf = pygame.Surface(size)
         self.rect = self.surf.get_rect(center=center, size=size)
         self.label_text = label_text
-        self.label = font.render(label_text, True, TEXT_COLOR)
+        self._label: pygame.Surface | None = None
         self.border_thickness = border_thickness
         self.active = True
 
+    @property
+    def label(self) -> pygame.Surface:
+        """Rendered label text, created on first use so headless runs never render fonts."""
+        if self._label is None:
+            self._label = get_font().render(self.label_text, True, TEXT_COLOR)
+        return self._label
+
     def update(self):
         """Draw the region."""
         self.surf.fill((0, 0, 0, 0))
@@ -145,7 +163,7 @@ class Bounds:
 class Person(pygame.sprite.Sprite):
     """Autonomous entity that can move and spread disease."""
     radius = 5
-    surf_size = radius*25
+    rect_size = radius*25  # extent of the person's rect, a coarse bound for proximity
     distancing_radius = radius*25
     infection_radius = radius*10
     speed = 120
@@ -171,50 +189,121 @@ class Person(pygame.sprite.Sprite):
         return self.state.value
 
     def __init__(self, bounds: Bounds, distancing_percent: NumericVariable,
-                 distancing_strength: NumericVariable, center: tuple[int, int] | None = None,
-                 state: State = State.SUSCEPTIBLE):
+                 distancing_strength: NumericVariable, clock: SimulationClock,
+                 center: tuple[int, int] | None = None, state: State = State.SUSCEPTIBLE,
+                 event_log: EventLog | None = None,
+                 scheduler: InfectionScheduler | None = None,
+                 streams: RandomStreams | None = None):
         super().__init__()
+        self.clock = clock
+        self.event_log = event_log
+        self.scheduler = scheduler  # infection events are polled every step without one
+        self.streams = streams if streams is not None else RandomStreams()
         self.id = Person.id_incrementer
         Person.id_incrementer += 1
-        self.surf = pygame.Surface((self.surf_size, self.surf_size), pygame.SRCALPHA)
         self.bounds = bounds
-        self.distancing = False
+        self._state = state
+        self._distancing = False
         self.distancing_percent = distancing_percent
         self.randomize_distancing()
         self.distancing_strength = distancing_strength
-        self.center = center or (random.randint(self.active_bounds.left + self.radius,
-                                                self.active_bounds.right - self.radius),
-                                 random.randint(self.active_bounds.top + self.radius,
-                                                self.active_bounds.bottom - self.radius))
-        self.rect = self.surf.get_rect(center=self.center)
-        self.state = state
-        self.direction = pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1)).normalize()
-        self.infected_start = None
-        self.infected_end = None
+        movement = self.streams.movement
+        self.center = center or (movement.randint(self.active_bounds.left + self.radius,
+                                                  self.active_bounds.right - self.radius),
+                                 movement.randint(self.active_bounds.top + self.radius,
+                                                  self.active_bounds.bottom - self.radius))
+        self.rect = pygame.Rect((0, 0), (self.rect_size, self.rect_size))
+        self.rect.center = self.center
+        self.previous_center: tuple[int, int] = self.rect.center
+        self.direction = pygame.Vector2(movement.uniform(-1, 1),
+                                        movement.uniform(-1, 1)).normalize()
+        self.infected_start: float | None = None
+        self.infected_end: float | None = None
         self.travel_target: Community | None = None
         self.last_event = 0
+        self.nears: list[Person] | None = None  # set while in standard operation
+        self.draws: list[float] = []  # uniforms for the current step, indexed by column
+        self.members: dict[int, Person] | None = None  # community members, set by PersonGroup
+        self.traveling = False
+        self.spreading = False
+        self.distanced = False
+
+    @property
+    def state(self) -> Person.State:
+        """Infection state of the person."""
+        return self._state
+
+    @state.setter
+    def state(self, state: Person.State):
+        if state is not self._state:
+            for group in self.groups():
+                if isinstance(group, PersonGroup):
+                    group.transition(self._state, state)
+            self._state = state
+
+    @property
+    def distancing(self) -> bool:
+        """Whether the person social distances."""
+        return self._distancing
+
+    @distancing.setter
+    def distancing(self, distancing: bool):
+        if distancing != self._distancing:
+            for group in self.groups():
+                if isinstance(group, PersonGroup):
+                    group.distancers += 1 if distancing else -1
+            self._distancing = distancing
+
+    @property
+    def community(self) -> Community:
+        """Community the person belongs to."""
+        return self.bounds.community
+
+    @community.setter
+    def community(self, community: Community):
+        if community is not self.bounds.community:
+            previous, self.bounds.community = self.bounds.community, community
+            for group in self.groups():
+                if isinstance(group, PersonGroup):
+                    group.relocate(self, previous)
 
     @property
     def active_bounds(self):
         """Return the topmost bounds for the person that is currently active."""
         return self.bounds.community if self.bounds.community.active else self.bounds.region
 
-    def update(self, persons: pygame.sprite.Group, frametime: float,
-               direction_toggle: Variable, network_toggle: Variable, distancing_toggle: Variable):
-        """Draw the person and handle interactions."""
-        self.surf.fill((0, 0, 0, 0))
-        center = (int(self.surf_size/2), int(self.surf_size/2))
+    def simulate(self, neighbors: SpatialHash, frametime: float, distancing_toggle: Variable,
+                 draws: list[float] | None = None):
+        """Handle movement and interactions without drawing anything.
+
+        `draws` is this person's row of an `rng.DrawPool`; without one, a row is drawn here.
+        """
+        self.draws = draws if draws is not None else self.roll_draws()
+        self.nears, self.traveling, self.spreading, self.distanced = None, False, False, False
+        self.previous_center = self.rect.center
         if self.state == Person.State.DECEASED:
             pass
         elif self.travel_target:
             self.travel(frametime)
         else:
-            self.operate(persons, frametime, direction_toggle, network_toggle, distancing_toggle)
-        pygame.draw.circle(self.surf, self.color, center, self.radius)
+            self.operate(neighbors, frametime, distancing_toggle)
+        neighbors.move(self)
+
+    def roll_draws(self) -> list[float]:
+        """Draw a row of uniforms for one step straight from the streams."""
+        infection_draws = INFECTION_DRAWS if self.scheduler is None else 0
+        return ([self.streams.movement.random() for _ in range(MOVEMENT_DRAWS)]
+                + [self.streams.infection.random() for _ in range(infection_draws)])
+
+    def interpolate(self, alpha: float) -> tuple[int, int]:
+        """Get the person's center part way between their last two simulated positions."""
+        return (round(self.previous_center[0]
+                      + (self.rect.centerx-self.previous_center[0])*alpha),
+                round(self.previous_center[1]
+                      + (self.rect.centery-self.previous_center[1])*alpha))
 
     def travel(self, frametime: float):
         """Ignore standard operation and navigate towards target community."""
-        center = (int(self.surf_size/2), int(self.surf_size/2))
         if not self.travel_target:
             raise RuntimeError("No target community found")
         to_target = -(pygame.Vector2(self.rect.center)
@@ -223,31 +312,28 @@ class Person(pygame.sprite.Sprite):
             self.direction = to_target.normalize()
         self.rect.move_ip(self.direction.x*self.speed*TRAVEL_SPEED_MULTIPLIER*frametime,
                             self.direction.y*self.speed*TRAVEL_SPEED_MULTIPLIER*frametime)
-        pygame.draw.line(self.surf, (255, 255, 0), center, center + self.direction*20)
+        self.traveling = True
         # if overlapping center region of target, stop traveling
         if self.travel_target.absolute_center_rect.collidepoint(self.rect.center):
-            self.bounds.community = self.travel_target
+            self.community = self.travel_target
             self.travel_target = None
 
-    def operate(self, persons: pygame.sprite.Group, frametime: float,
-                direction_toggle: Variable, network_toggle: Variable,
-                distancing_toggle: Variable):
+    def operate(self, neighbors: SpatialHash, frametime: float, distancing_toggle: Variable):
         """Handle standard operation of the person."""
-        center = (int(self.surf_size/2), int(self.surf_size/2))
-        if random.random() < 0.5:
-            self.direction.rotate_ip(random.randint(-10, 10))
+        if self.draws[TURN] < 0.5:
+            self.direction.rotate_ip(int(self.draws[TURN_ANGLE]*21) - 10)
         self.avoid_walls()
-        nears = self.get_nearby(persons)
-        if self.state == self.State.INFECTED and self.infected_start:
+        nears = self.get_nearby(neighbors)
+        if (self.scheduler is None and self.state == self.State.INFECTED
+                and self.infected_start is not None):
             self.handle_infection(nears)
         if distancing_toggle.value and self.distancing and nears:
             self.social_distance(nears)
-            pygame.draw.circle(self.surf, (255, 255, 255, 64),
-                                center, self.radius*3, width=1)
+            self.distanced = True
         self.rect.move_ip(self.direction.x*self.speed*frametime,
                             self.direction.y*self.speed*frametime)
         self.stay_in_bounds()
-        self.display_details(network_toggle, direction_toggle, nears)
+        self.nears = nears
 
     def avoid_walls(self):
         """Change the player's direction when they encounter a wall."""
@@ -264,76 +350,82 @@ class Person(pygame.sprite.Sprite):
         elif abs(self.rect.center[1] - self.active_bounds.bottom) < 10:
             self.direction = pygame.Vector2(0, -1)
             adjusted = True
-        if adjusted and random.random() < 0.5:
-            self.direction.rotate_ip(random.randint(-80, 80))
+        if adjusted and self.draws[BOUNCE] < 0.5:
+            self.direction.rotate_ip(int(self.draws[BOUNCE_ANGLE]*161) - 80)
 
-    def get_nearby(self, persons: pygame.sprite.Group) -> list[Person]:
+    def get_nearby(self, neighbors: SpatialHash) -> list[Person]:
         """Get nearby people within distancing radius."""
-        others: list[Person] = persons.sprites()
+        others: list[Person] = neighbors.query(self.rect.center)  # type: ignore
         nears = [other for other in others  # optimize for next step
-                if self.rect.colliderect(other.rect) and
-                other.state != Person.State.DECEASED and
-                not other.travel_target and
-                self.active_bounds == other.active_bounds]
+                 if self.rect.colliderect(other.rect) and
+                 other.state != Person.State.DECEASED and
+                 not other.travel_target]
+        if self.bounds.community.active:  # otherwise everyone shares the field
+            if (members := self.members) is not None:  # indexed by a PersonGroup
+                nears = [other for other in nears if other.id in members]
+            else:
+                nears = [other for other in nears
+                         if self.active_bounds == other.active_bounds]
         return [other for other in nears   # gather people within distance radius?
                 if (pygame.Vector2(self.rect.center)
                     - pygame.Vector2(other.rect.center)).length() < self.distancing_radius]
 
     def handle_infection(self, nears: list[Person]):
         """Handle infection events."""
-        if not self.infected_start:
+        if self.infected_start is None:
             raise RuntimeError("Infection start time not found")
-        if perf_counter()-self.infected_start >= MAX_INFECTION_DURATION:
+        if self.clock()-self.infected_start >= MAX_INFECTION_DURATION:
             self.end_infection()
         if (not self.travel_target and
-            perf_counter()-self.last_event >= INFECTION_EVENT_INTERVAL):
-            if random.random() < SPREAD_CHANCE:
-                center = (int(self.surf_size/2), int(self.surf_size/2))
-                self.spread(nears, center)
-            if random.random() < EARLY_TERMINATION_CHANCE:
-                self.end_infection()
-            self.last_event = perf_counter()
+            self.clock()-self.last_event >= INFECTION_EVENT_INTERVAL):
+            self.infection_event(nears)
+
+    def infection_event(self, nears: list[Person]):
+        """Attempt to spread the infection, and possibly end it early."""
+        if self.draws[SPREAD] < SPREAD_CHANCE:
+            self.spread(nears)
+        if self.draws[TERMINATION] < EARLY_TERMINATION_CHANCE:
+            self.end_infection()
+        self.last_event = self.clock()
 
     def end_infection(self):
         """Decide whether the person recovers or dies according to mortality chance."""
-        self.infected_end = perf_counter()
-        if random.random() <= MORTALITY_CHANCE:
+        self.infected_end = self.clock()
+        if self.streams.infection.random() <= MORTALITY_CHANCE:
             self.die()
         else:
             self.recover()
 
     def recover(self):
         """Mark the player as recovered and end their infection."""
+        self.log_transition(Person.State.RECOVERED)
         self.state = Person.State.RECOVERED
-        if self.infected_end and self.infected_start:
-            print(f"Person {self.id} recovered " \
-                  f"({round(self.infected_end-self.infected_start)}s)")
-        self.distancing = random.random() <= RECOVERED_NONDISTANCER_CHANCE
+        self.distancing = self.streams.infection.random() <= RECOVERED_NONDISTANCER_CHANCE
 
     def die(self):
         """Mark the person as deceased. They will be visible but no longer move or interact."""
+        self.log_transition(Person.State.DECEASED)
         self.state = Person.State.DECEASED
-        if self.infected_end and self.infected_start:
-            print(f"Person {self.id} died ({round(self.infected_end-self.infected_start)}s)")
 
     def social_distance(self, nears: list[Person]):
         """Change the direction of the person to avoid those nearby."""
-        forces = [(diff_vector * PROXIMITY_COEFFICIENT
-                   * (1 - (diff_vector.length() / self.distancing_radius))**2)
-                  for other in nears
-                  if (diff_vector := pygame.Vector2(self.rect.center)
-                      - pygame.Vector2(other.rect.center)).length()]
-        if forces:
-            force: pygame.Vector2 = reduce(lambda a, b: a + b, forces)/len(forces)
+        force, count = pygame.Vector2(), 0
+        for other in nears:
+            diff_vector = pygame.Vector2(self.rect.center) - pygame.Vector2(other.rect.center)
+            if (distance := diff_vector.length()):
+                diff_vector *= PROXIMITY_COEFFICIENT * (1 - distance/self.distancing_radius)**2
+                force += diff_vector
+                count += 1
+        if count:
+            force /= count
             if force and force.length():
                 force = force.normalize()
             intermediate = self.direction+force*self.distancing_strength.value
             self.direction = intermediate.normalize() if intermediate.length() else self.direction
 
-    def spread(self, nears: list[Person], center):
-        """Attempt to transmit the infection from the person, drawing the infection radius."""
-        pygame.draw.circle(self.surf, (255, 0, 0, 64),
-                           center, self.infection_radius)
+    def spread(self, nears: list[Person]):
+        """Attempt to transmit the infection from the person, marking the infection radius."""
+        self.spreading = True
         nears = [other for other in nears
                  if (pygame.Vector2(self.rect.center)
                      - pygame.Vector2(other.rect.center)).length() < self.infection_radius]
@@ -342,17 +434,25 @@ class Person(pygame.sprite.Sprite):
                 Person.State.SUSCEPTIBLE: INFECTION_CHANCE,
                 Person.State.RECOVERED: REINFECTION_CHANCE,
                 }.get(other.state, 0)
-            if other is not self and random.random() < chance:
-                other.get_infected()
+            if other is not self and self.streams.infection.random() < chance:
+                other.get_infected(self)
 
-    def get_infected(self):
+    def get_infected(self, source: Person | None = None):
         """Mark the person as infected, allowing them to spread the infection."""
-        self.infected_start = perf_counter()
+        self.infected_start = self.clock()
         self.infected_end = None
-        print(f"Person {self.id} infected")
-        self.last_event = max(0, perf_counter()-random.random()*5)
+        self.log_transition(Person.State.INFECTED, source)
+        self.last_event = max(0, self.clock()-self.streams.infection.random()*5)
         self.state = Person.State.INFECTED
-        self.distancing = random.random() <= INFECTED_DISTANCER_CHANCE
+        self.distancing = self.streams.infection.random() <= INFECTED_DISTANCER_CHANCE
+        if self.scheduler is not None:
+            self.scheduler.schedule(self)
+
+    def log_transition(self, state: Person.State, source: Person | None = None):
+        """Record a change to a new state in the event log, if one is attached."""
+        if self.event_log is not None:
+            self.event_log.record(self.clock(), self.id, STATE_CODES[self.state],
+                                  STATE_CODES[state], source.id if source else NO_SOURCE)
 
     def stay_in_bounds(self):
         """Force the player's location to stay within active bounds."""
@@ -365,82 +465,275 @@ class Person(pygame.sprite.Sprite):
                     self.active_bounds.bottom - self.radius))
             )
 
-    def display_details(self, network_toggle: Variable,
-                        direction_toggle: Variable, nears: list[Person]):
-        """Display extra per-person visual information."""
-        center = (int(self.surf_size/2), int(self.surf_size/2))
-        if network_toggle.value:
-            for other in nears:
-                if (to_other := (pygame.Vector2(self.rect.center)
-                                    - pygame.Vector2(other.rect.center))):
-                    intensity = self.get_intensity(to_other.length(), self.distancing_radius)
-                    color = self.gradient.get_color(intensity)
-                    pygame.draw.line(self.surf, (*color, intensity),
-                                        center, center - to_other/2)
-        if direction_toggle.value:
-            pygame.draw.line(self.surf, (0, 255, 255), center, center + self.direction*20)
-
     def randomize_distancing(self):
         """Randomize whether the person social distances or not based on the variable."""
-        self.distancing = random.random() <= self.distancing_percent.value/100
+        self.distancing = self.streams.actions.random() <= self.distancing_percent.value/100
 
     def start_traveling(self, target: Community):
         """Assign a community for the person to travel towards."""
         self.travel_target = target
 
     @staticmethod
-    @cache
-    def get_intensity(distance: int | float, radius: int):
+    def get_intensity(distance: int | float, radius: int) -> int:
         """Get color intensity value based on proximity of those nearby."""
-        return abs(int(255*(1-(min(distance, radius)/radius))))
+        table = intensity_table(radius)
+        return int(table[min(int(distance*INTENSITY_RESOLUTION), len(table)-1)])
+
+    @staticmethod
+    def get_intensities(distances: np.ndarray, radius: int) -> np.ndarray:
+        """Get color intensity values for an array of distances at once."""
+        table = intensity_table(radius)
+        indices = (np.asarray(distances)*INTENSITY_RESOLUTION).astype(np.intp)
+        return table[np.minimum(indices, len(table)-1)]
+
+
+@lru_cache(maxsize=8)
+def intensity_table(radius: int) -> np.ndarray:
+    """Intensities from 255 at no distance down to 0 at `radius`, indexed by distance
+    quantized to `INTENSITY_RESOLUTION` steps per pixel."""
+    distances = np.arange(radius*INTENSITY_RESOLUTION + 1) / INTENSITY_RESOLUTION
+    table = (255*(1-distances/radius)).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+STATE_CODES: dict[Person.State, int] = {state: code for code, state in enumerate(Person.State)}
+
+
+class PersonGroup(pygame.sprite.Group):
+    """Group of people that keeps running counts of infection states and distancers.
+
+    `members` indexes people by community and then by id, in the order they joined, so
+    picking from a community never scans the whole population.
+    """
+    def __init__(self, *sprites: Person):
+        self.state_counts: dict[Person.State, int] = dict.fromkeys(Person.State, 0)
+        self.distancers = 0
+        self.members: dict[Community, dict[int, Person]] = {}
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite: Person, layer=None):  # type: ignore[override]
+        super().add_internal(sprite, layer)
+        self.state_counts[sprite.state] += 1
+        self.distancers += sprite.distancing
+        self.join(sprite)
+
+    def remove_internal(self, sprite: Person):  # type: ignore[override]
+        super().remove_internal(sprite)
+        self.state_counts[sprite.state] -= 1
+        self.distancers -= sprite.distancing
+        del self.members[sprite.community][sprite.id]
+        sprite.members = None
+
+    def join(self, person: Person):
+        """Index a person under their community."""
+        person.members = self.members.setdefault(person.community, {})
+        person.members[person.id] = person
+
+    def relocate(self, person: Person, previous: Community):
+        """Move a person's index entry after they change community."""
+        del self.members[previous][person.id]
+        self.join(person)
+
+    def community_members(self, community: Community) -> list[Person]:
+        """People belonging to a community."""
+        return list(self.members.get(community, {}).values())
+
+    def transition(self, old: Person.State, new: Person.State):
+        """Move one person's count from one state to another."""
+        self.state_counts[old] -= 1
+        self.state_counts[new] += 1
+
+    def counts(self) -> dict[str, int]:
+        """Count people in each infection state, keyed like the chart data."""
+        return {str(state): count for state, count in self.state_counts.items()}
+
+
+class InfectionScheduler:
+    """Wake infected people only when an infection event is due.
+
+    Events sit in a heap of (time, person id, kind). A person's events are scheduled
+    when they are infected, and each infection event schedules the next one. An entry
+    is skipped when it no longer matches the person's infection, e.g. after they
+    recover, are reinfected or are removed. Events due while a person travels wait
+    until they next operate normally, as they do when infection is polled.
+    """
+    END, EVENT = 0, 1  # end of the maximum infection duration, spread/early end attempt
+
+    def __init__(self, clock: SimulationClock, streams: RandomStreams):
+        self.clock = clock
+        self.rng = streams.generator("infection")
+        self.heap: list[tuple[float, int, int]] = []
+        self.people: dict[int, Person] = {}
+        self.deferred: list[tuple[float, int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.heap) + len(self.deferred)
+
+    def schedule(self, person: Person):
+        """Schedule the end of a newly infected person's infection and their first event."""
+        if person.infected_start is None:
+            raise RuntimeError("Infection start time not found")
+        self.people[person.id] = person
+        heapq.heappush(self.heap, (person.infected_start + MAX_INFECTION_DURATION,
+                                   person.id, self.END))
+        heapq.heappush(self.heap, (person.last_event + INFECTION_EVENT_INTERVAL,
+                                   person.id, self.EVENT))
+
+    def due_time(self, person: Person, kind: int) -> float | None:
+        """When an event of a kind is currently due for a person, if they are infected."""
+        if person.state is not Person.State.INFECTED or person.infected_start is None:
+            return None
+        return (person.infected_start + MAX_INFECTION_DURATION if kind == self.END
+                else person.last_event + INFECTION_EVENT_INTERVAL)
+
+    def run(self):
+        """Handle every event that is due. Call after people have moved in a step."""
+        now = self.clock()
+        due, self.deferred = self.deferred, []
+        events: list[Person] = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap))
+        for entry in due:
+            time, person_id, kind = entry
+            person = self.people.get(person_id)
+            if person is None or not person.alive():
+                self.people.pop(person_id, None)
+                continue
+            if self.due_time(person, kind) != time:
+                continue  # stale entry from an earlier infection or event
+            if person.travel_target or person.nears is None:
+                self.deferred.append(entry)
+            elif kind == self.END:
+                person.end_infection()
+            else:
+                events.append(person)
+        if events := [person for person in events if person.state is Person.State.INFECTED]:
+            self.infection_events(events)
+            for person in events:
+                if (next_time := self.due_time(person, self.EVENT)) is not None:
+                    heapq.heappush(self.heap, (next_time, person.id, self.EVENT))
+
+    def infection_events(self, people: list[Person]):
+        """Handle the infection events of several people at once, like
+        `Person.infection_event` but with one batched transmission step."""
+        spread_draws, termination_draws = self.rng.random((2, len(people)))
+        spreaders = [person for person, draw in zip(people, spread_draws.tolist())
+                     if draw < SPREAD_CHANCE]
+        chances = {Person.State.SUSCEPTIBLE: INFECTION_CHANCE,
+                   Person.State.RECOVERED: REINFECTION_CHANCE}
+        targets: dict[int, Person] = {}
+        pairs = []  # (spreader index, target id, x difference, y difference, chance)
+        for i, spreader in enumerate(spreaders):
+            spreader.spreading = True
+            x, y = spreader.rect.center
+            for other in spreader.nears or ():
+                if (chance := chances.get(other.state)) and other is not spreader:
+                    targets[other.id] = other
+                    other_x, other_y = other.rect.center
+                    pairs.append((i, other.id, x-other_x, y-other_y, chance))
+        if pairs:
+            columns = np.array(pairs, dtype=np.float64)
+            infected, sources = transmit(columns[:, 0].astype(np.intp),
+                                         columns[:, 1].astype(np.int64), columns[:, 2:4],
+                                         columns[:, 4], Person.infection_radius, self.rng)
+            for target_id, source in zip(infected.tolist(), sources.tolist()):
+                targets[target_id].get_infected(spreaders[source])
+        now = self.clock()
+        for person, draw in zip(people, termination_draws.tolist()):
+            if draw < EARLY_TERMINATION_CHANCE:
+                person.end_infection()
+            person.last_event = now
+
+
+def transmit(sources: np.ndarray, targets: np.ndarray, differences: np.ndarray,
+             chances: np.ndarray, radius: float,
+             rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Run Bernoulli transmission trials for (source, target) pairs in one draw.
+
+    Pairs further apart than `radius` (by their `differences` in position) are ignored.
+    Returns each newly infected target once, sorted, with the first source that
+    transmitted to it.
+    """
+    within = np.hypot(differences[:, 0], differences[:, 1]) < radius
+    sources, targets, chances = sources[within], targets[within], chances[within]
+    transmitted = rng.random(len(targets)) < chances
+    infected, first = np.unique(targets[transmitted], return_index=True)
+    return (infected, sources[transmitted][first])
 
 
 class Chart(pygame.sprite.Sprite):
-    """Stacked area chart for population breakdown."""
+    """Stacked area chart for population breakdown.
+
+    Samples are kept in fixed-capacity ring buffers, one column per sample. The chart
+    surface persists between frames: each new sample scrolls it left by
+    `snapshot_width` and draws only the new columns.
+    """
     update_interval = 1  # interval in seconds to update the chart
     snapshot_width = 1  # width in pixels of each update
+    background_color = (255, 255, 255)
     def __init__(self, size: tuple[int, int], center: tuple[int, int],
-                 values: tuple[tuple[str, tuple[int, int, int]],...]):
+                 values: tuple[tuple[str, tuple[int, int, int]],...], clock: SimulationClock):
         super().__init__()
+        self.clock = clock
         self.surf = pygame.Surface(size)
         self.rect = self.surf.get_rect(center=center, size=size)
-        self.data: list = [(0.0, 0.0, 1.0, 0.0)]*size[0]
         self.values = values  # values for chart from bottom to top
-        self.last_update = perf_counter()
+        # ring buffers of each column's shares of the values, or its event marker color
+        self.shares = np.zeros((size[0], len(values)))
+        self.shares[:, [name for name, _ in values].index("susceptible")] = 1.0
+        self.markers = np.zeros((size[0], 3), dtype=np.uint8)
+        self.marked = np.zeros(size[0], dtype=bool)
+        self.head = 0  # index of the oldest column, overwritten next
+        self.last_update = self.clock()
         self.event_marker: tuple[int, int, int] | None = None
+        self.dirty = True  # whether the last update changed the surface
+        for i in range(size[0]):
+            self.draw_column(i, i)
 
     def update(self, data: dict[str, int]):
-        """Draw the chart."""
-        chart_width, chart_height = self.surf.get_size()
-        # store new data
-        if perf_counter() - self.last_update >= self.update_interval:
-            for _ in range(self.snapshot_width):
-                if self.event_marker:
-                    self.data.append(self.event_marker)
-                    self.event_marker = None
-                else:
-                    total = sum(data.values())
-                    entry = tuple(data[value[0]]/total for value in self.values)
-                    self.data.append(entry)  # type: ignore
-                    if (overflow := len(self.data) - chart_width):
-                        self.data = self.data[overflow:]
-            self.last_update = perf_counter()
-        # draw existing data
-        for i in range(chart_width):
-            if all(isinstance(member, int) for member in self.data[i]):
-                pygame.draw.line(self.surf, self.data[i], (i, chart_height), (i, 0))
+        """Add a sample to the chart once per update interval."""
+        self.dirty = self.clock() - self.last_update >= self.update_interval
+        if not self.dirty:
+            return
+        chart_width = self.surf.get_width()
+        total = sum(data.values())
+        shares = [data[name]/total for name, _ in self.values]
+        self.surf.scroll(-self.snapshot_width, 0)
+        for x in range(chart_width-self.snapshot_width, chart_width):
+            if self.event_marker:
+                self.markers[self.head] = self.event_marker
+                self.marked[self.head] = True
+                self.event_marker = None
             else:
-                vertical_start = 0
-                pygame.draw.line(self.surf, (255, 255, 255), (i, chart_height), (i, 0))
-                for j, value in enumerate(self.data[i]):
-                    length = round(value*chart_height)
-                    color = self.values[j][1]
-                    start = (i, chart_height-vertical_start)
-                    end = (i, chart_height-vertical_start-length)
-                    if end[1] == 1:
-                        end = (i, 0)  # handle stray pixel from rounding errors
-                    pygame.draw.line(self.surf, color, start, end)
-                    vertical_start += length
+                self.shares[self.head] = shares
+                self.marked[self.head] = False
+            self.draw_column(self.head, x)
+            self.head = (self.head+1) % chart_width
+        self.last_update = self.clock()
+
+    def draw_column(self, index: int, x: int):
+        """Draw the column stored at ring buffer `index` at horizontal position `x`."""
+        chart_height = self.surf.get_height()
+        if self.marked[index]:
+            pygame.draw.line(self.surf, self.markers[index].tolist(),
+                             (x, chart_height), (x, 0))
+            return
+        pygame.draw.line(self.surf, self.background_color, (x, chart_height), (x, 0))
+        vertical_start = 0
+        for value, (_, color) in zip(self.shares[index].tolist(), self.values):
+            length = round(value*chart_height)
+            start = (x, chart_height-vertical_start)
+            end = (x, chart_height-vertical_start-length)
+            if end[1] == 1:
+                end = (x, 0)  # handle stray pixel from rounding errors
+            pygame.draw.line(self.surf, color, start, end)
+            vertical_start += length
+
+    def history(self) -> tuple[np.ndarray, np.ndarray]:
+        """Column shares and whether each column is an event marker, oldest first."""
+        order = np.roll(np.arange(len(self.shares)), -self.head)
+        return (self.shares[order], self.marked[order])
 
     def mark_event(self, color: tuple[int, int, int]):
         """Add a colored event marker to plot on the chart."""
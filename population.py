@@ -0,0 +1,485 @@
+"""Vectorized structure-of-arrays population engine."""
+# pylint: disable=invalid-name
+from __future__ import annotations
+from typing import Iterator, Sequence
+
+import numpy as np
+
+import objects
+from clock import SimulationClock
+from controls import NumericVariable, Variable
+from eventlog import NO_SOURCE, EventLog
+from objects import Community, Person, Region, transmit
+from rng import RandomStreams
+
+
+STATES: tuple[Person.State, ...] = tuple(Person.State)
+SUSCEPTIBLE, INFECTED, RECOVERED, DECEASED = (STATES.index(state) for state in (
+    Person.State.SUSCEPTIBLE, Person.State.INFECTED,
+    Person.State.RECOVERED, Person.State.DECEASED))
+NO_TARGET = -1
+
+CELL_STRIDE = 1 << 20  # packs (column, row) grid cells into a single sortable key
+DISTANCING_BLOCK = 1 << 20  # candidate pairs examined at once when social distancing
+
+
+def rotate(vectors: np.ndarray, degrees: np.ndarray) -> np.ndarray:
+    """Rotate an (n, 2) array of vectors by per-row angles in degrees."""
+    radians = np.radians(degrees)
+    cos, sin = np.cos(radians), np.sin(radians)
+    return np.column_stack((vectors[:, 0]*cos - vectors[:, 1]*sin,
+                            vectors[:, 0]*sin + vectors[:, 1]*cos))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale an (n, 2) array of vectors to unit length, leaving zero vectors untouched."""
+    lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+    safe = np.where(lengths > 0, lengths, 1)
+    return vectors / safe[:, None]
+
+
+def repulsion(directions: np.ndarray, agents: np.ndarray, differences: np.ndarray,
+              radius: float, strength: float) -> np.ndarray:
+    """Steer headings away from neighbors, batched over neighbor pairs.
+
+    Pair k pushes agent `agents[k]` (a row of `directions`) along `differences[k]`, the
+    vector from the neighbor to the agent. As in `Person.social_distance`, each agent's
+    force is the mean of `PROXIMITY_COEFFICIENT * (1 - d/radius)**2` times those vectors
+    over neighbors at nonzero distance d; it is normalized, scaled by `strength` and
+    added to the heading, which is normalized again. Agents without such neighbors keep
+    their heading.
+    """
+    pushed, forces = repulsion_sums(agents, differences, radius, len(directions))
+    return steer(directions, pushed, forces, strength)
+
+
+def repulsion_sums(agents: np.ndarray, differences: np.ndarray, radius: float,
+                   count: int) -> tuple[np.ndarray, np.ndarray]:
+    """Count each of `count` agents' pushing neighbors and sum their weighted push
+    vectors, so pairs can be accumulated a block at a time before `steer`."""
+    distances = np.hypot(differences[:, 0], differences[:, 1])
+    apart = distances > 0
+    agents, differences, distances = agents[apart], differences[apart], distances[apart]
+    weights = objects.PROXIMITY_COEFFICIENT * (1 - distances/radius)**2
+    return (np.bincount(agents, minlength=count),
+            np.column_stack((np.bincount(agents, differences[:, 0]*weights, count),
+                             np.bincount(agents, differences[:, 1]*weights, count))))
+
+
+def steer(directions: np.ndarray, pushed: np.ndarray, forces: np.ndarray,
+          strength: float) -> np.ndarray:
+    """Turn headings by the mean of their summed repulsion forces (see `repulsion`)."""
+    repelled = pushed > 0
+    forces = normalize(forces[repelled] / pushed[repelled, None])
+    turned = directions[repelled] + forces*strength
+    lengths = np.hypot(turned[:, 0], turned[:, 1])
+    headings = directions.copy()
+    # a force cancelling the heading exactly leaves it as it was, as for a single person
+    headings[repelled] = np.where(lengths[:, None] > 0, normalize(turned), directions[repelled])
+    return headings
+
+
+def neighbor_blocks(positions: np.ndarray, queries: np.ndarray, candidates: np.ndarray,
+                    radius: float, max_pairs: int | None = None
+                    ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """Yield (query, candidate) index pairs closer than a radius using a uniform grid.
+
+    Queries are taken in consecutive runs with about `max_pairs` candidates in their
+    surrounding 3x3 cells, so memory follows `max_pairs` instead of queries times
+    neighbors. Without `max_pairs` every pair comes in a single block.
+    """
+    if not len(queries) or not len(candidates):
+        return
+    cells = np.floor(positions / radius).astype(np.int64)
+    candidate_keys = cells[candidates, 0]*CELL_STRIDE + cells[candidates, 1]
+    order = np.argsort(candidate_keys, kind="stable")
+    sorted_keys, sorted_candidates = candidate_keys[order], candidates[order]
+    query_cells = cells[queries]
+    starts = np.empty((9, len(queries)), dtype=np.intp)
+    counts = np.empty((9, len(queries)), dtype=np.intp)
+    for k, (dx, dy) in enumerate((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)):
+        keys = (query_cells[:, 0]+dx)*CELL_STRIDE + query_cells[:, 1]+dy
+        starts[k] = np.searchsorted(sorted_keys, keys, "left")
+        counts[k] = np.searchsorted(sorted_keys, keys, "right") - starts[k]
+    bounds = [0, len(queries)]
+    if max_pairs is not None:
+        # a query joins the block its first candidate pair falls in
+        totals = counts.sum(axis=0)
+        block = (np.cumsum(totals) - totals) // max_pairs
+        bounds[1:1] = (np.flatnonzero(np.diff(block)) + 1).tolist()
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        found_queries, found_candidates = [], []
+        for block_starts, block_counts in zip(starts[:, first:last], counts[:, first:last]):
+            if not (total := int(block_counts.sum())):
+                continue
+            offsets = np.arange(total) - np.repeat(np.cumsum(block_counts)-block_counts,
+                                                   block_counts)
+            found_queries.append(np.repeat(queries[first:last], block_counts))
+            found_candidates.append(
+                sorted_candidates[np.repeat(block_starts, block_counts) + offsets])
+        if not found_queries:
+            continue
+        pair_queries = np.concatenate(found_queries)
+        pair_candidates = np.concatenate(found_candidates)
+        differences = positions[pair_queries] - positions[pair_candidates]
+        close = ((np.hypot(differences[:, 0], differences[:, 1]) < radius)
+                 & (pair_queries != pair_candidates))
+        yield (pair_queries[close], pair_candidates[close])
+
+
+def neighbor_pairs(positions: np.ndarray, queries: np.ndarray, candidates: np.ndarray,
+                   radius: float) -> tuple[np.ndarray, np.ndarray]:
+    """Find (query, candidate) index pairs closer than a radius using a uniform grid."""
+    empty = np.empty(0, dtype=np.intp)
+    return next(neighbor_blocks(positions, queries, candidates, radius), (empty, empty))
+
+
+class Population:
+    """Whole population of people held in contiguous arrays and updated in batches.
+
+    Mirrors the behavior of `Person` (movement, wall avoidance, social distancing,
+    bounds, travel and infection state transitions) without a Python-level object per
+    agent. Distancing only applies while `distancing_toggle` is given and enabled.
+    Infection events fall due as with `InfectionScheduler`, found each step with one
+    comparison over the infected instead of a heap. `simulation.ArraySimulation` runs
+    it with the actions of `Simulation`.
+
+    Distancing examines candidate pairs `DISTANCING_BLOCK` at a time, so its memory is
+    bounded by the block size (plus the candidates of any single distancer), but its
+    time still grows with distancers times people in their surrounding cells. Crowding
+    hundreds of thousands of distancers into a few communities is therefore slow.
+    """
+    radius = Person.radius
+    infection_radius = Person.infection_radius
+    distancing_radius = Person.distancing_radius
+    speed = Person.speed
+    initial_capacity = 1024
+
+    def __init__(self, communities: Sequence[Community], region: Region,
+                 distancing_percent: NumericVariable, distancing_strength: NumericVariable,
+                 clock: SimulationClock | None = None, seed: int | None = None,
+                 event_log: EventLog | None = None, distancing_toggle: Variable | None = None):
+        self.communities = list(communities)
+        self.region = region
+        self.distancing_percent = distancing_percent
+        self.distancing_strength = distancing_strength
+        self.distancing_toggle = distancing_toggle
+        self.streams = RandomStreams(seed)
+        # independent generators, so e.g. movement draws never shift infection outcomes
+        self.movement = self.streams.generator("movement")
+        self.infection = self.streams.generator("infection")
+        self.actions = self.streams.generator("actions")
+        self.clock = clock or SimulationClock()
+        self.event_log = event_log
+        self.count = 0
+        self.next_id = 0
+        self.community_bounds = np.array(
+            [(community.left, community.top, community.right, community.bottom)
+             for community in self.communities], dtype=np.float64).reshape(-1, 4)
+        self.region_bounds = np.array(
+            (region.left, region.top, region.right, region.bottom), dtype=np.float64)
+        self.community_centers = np.array(
+            [community.absolute_center_rect.center for community in self.communities],
+            dtype=np.float64).reshape(-1, 2)
+        self.community_center_rects = np.array(
+            [(rect.left, rect.top, rect.right, rect.bottom)
+             for rect in (community.absolute_center_rect for community in self.communities)],
+            dtype=np.float64).reshape(-1, 4)
+        self._allocate(self.initial_capacity)
+
+    def _allocate(self, capacity: int):
+        """Create (or grow) the backing arrays, preserving existing agents."""
+        fields = {
+            "ids": (np.int64, ()),
+            "position": (np.float64, (2,)),
+            "previous_position": (np.float64, (2,)),
+            "direction": (np.float64, (2,)),
+            "state": (np.int8, ()),
+            "infected_start": (np.float64, ()),
+            "infected_end": (np.float64, ()),
+            "last_event": (np.float64, ()),
+            "distancing": (np.bool_, ()),
+            "community": (np.int16, ()),
+            "travel_target": (np.int16, ()),
+            }
+        for name, (dtype, shape) in fields.items():
+            array = np.zeros((capacity, *shape), dtype=dtype)
+            if (old := getattr(self, f"_{name}", None)) is not None:
+                array[:self.count] = old[:self.count]
+            setattr(self, f"_{name}", array)
+        self.capacity = capacity
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Stable identifiers of the living population."""
+        return self._ids[:self.count]
+
+    @property
+    def position(self) -> np.ndarray:
+        """(n, 2) array of agent centers."""
+        return self._position[:self.count]
+
+    @property
+    def previous_position(self) -> np.ndarray:
+        """(n, 2) array of agent centers before the last step, for interpolation."""
+        return self._previous_position[:self.count]
+
+    @property
+    def direction(self) -> np.ndarray:
+        """(n, 2) array of unit heading vectors."""
+        return self._direction[:self.count]
+
+    @property
+    def state(self) -> np.ndarray:
+        """Infection state codes, indexing into `STATES`."""
+        return self._state[:self.count]
+
+    @property
+    def infected_start(self) -> np.ndarray:
+        """Simulation time each agent was last infected (NaN if never)."""
+        return self._infected_start[:self.count]
+
+    @property
+    def infected_end(self) -> np.ndarray:
+        """Simulation time each agent's last infection ended (NaN if ongoing or never)."""
+        return self._infected_end[:self.count]
+
+    @property
+    def last_event(self) -> np.ndarray:
+        """Simulation time of each agent's last infection event."""
+        return self._last_event[:self.count]
+
+    @property
+    def distancing(self) -> np.ndarray:
+        """Whether each agent social distances."""
+        return self._distancing[:self.count]
+
+    @property
+    def community(self) -> np.ndarray:
+        """Index of each agent's home community."""
+        return self._community[:self.count]
+
+    @property
+    def travel_target(self) -> np.ndarray:
+        """Index of each agent's travel target community, or `NO_TARGET`."""
+        return self._travel_target[:self.count]
+
+    def add(self, count: int, community: int | np.ndarray | None = None,
+            positions: np.ndarray | None = None, state: int = SUSCEPTIBLE) -> np.ndarray:
+        """Add people to a community, or one each, cycling through communities unless
+        given. Returns their indices."""
+        if self.count + count > self.capacity:
+            capacity = self.capacity
+            while self.count + count > capacity:
+                capacity *= 2
+            self._allocate(capacity)
+        indices = np.arange(self.count, self.count + count)
+        self.count += count
+        self._ids[indices] = np.arange(self.next_id, self.next_id + count)
+        self.next_id += count
+        self._community[indices] = (community if community is not None
+                                    else (self._ids[indices] % len(self.communities)))
+        self._travel_target[indices] = NO_TARGET
+        self._state[indices] = state
+        self._infected_start[indices] = np.nan
+        self._infected_end[indices] = np.nan
+        self._last_event[indices] = 0
+        self._distancing[indices] = (self.actions.random(count)
+                                     <= self.distancing_percent.value/100)
+        if positions is None:
+            bounds = self.active_bounds(indices).astype(np.int64)
+            positions = np.column_stack((
+                self.movement.integers(bounds[:, 0] + self.radius, bounds[:, 2] - self.radius,
+                                       endpoint=True),
+                self.movement.integers(bounds[:, 1] + self.radius, bounds[:, 3] - self.radius,
+                                       endpoint=True)))
+        self._position[indices] = positions
+        self._previous_position[indices] = positions
+        self._direction[indices] = normalize(self.movement.uniform(-1, 1, (count, 2)))
+        return indices
+
+    def remove(self, indices: np.ndarray):
+        """Remove people by index, compacting the arrays."""
+        keep = np.ones(self.count, dtype=np.bool_)
+        keep[indices] = False
+        remaining = int(keep.sum())
+        for name in ("ids", "position", "previous_position", "direction", "state", "infected_start",
+                     "infected_end", "last_event", "distancing", "community", "travel_target"):
+            array = getattr(self, f"_{name}")
+            array[:remaining] = array[:self.count][keep]
+        self.count = remaining
+
+    def active_index(self, indices: np.ndarray | slice = slice(None)) -> np.ndarray:
+        """Community index of each agent's active bounds, or -1 where the region is active."""
+        active = np.array([community.active for community in self.communities], dtype=np.bool_)
+        communities = self.community[indices]
+        return np.where(active[communities], communities, -1)
+
+    def active_bounds(self, indices: np.ndarray | slice = slice(None)) -> np.ndarray:
+        """(n, 4) array of left, top, right, bottom for each agent's active bounds."""
+        active = self.active_index(indices)
+        table = np.vstack((self.community_bounds, self.region_bounds))
+        return table[np.where(active >= 0, active, len(self.communities))]
+
+    def counts(self) -> dict[str, int]:
+        """Count people in each infection state, keyed like the chart data."""
+        totals = np.bincount(self.state, minlength=len(STATES))
+        return {str(state): int(totals[i]) for i, state in enumerate(STATES)}
+
+    def log_transitions(self, indices: np.ndarray, states: np.ndarray | int,
+                        sources: np.ndarray | None = None):
+        """Record changes to new states in the event log, if one is attached."""
+        if self.event_log is None or not len(indices):
+            return
+        count = len(indices)
+        self.event_log.record_many(
+            np.full(count, self.clock()), self.ids[indices], self.state[indices],
+            np.broadcast_to(states, (count,)),
+            self.ids[sources] if sources is not None else np.full(count, NO_SOURCE))
+
+    def infect(self, indices: np.ndarray, sources: np.ndarray | None = None):
+        """Mark people as infected, allowing them to spread the infection."""
+        count = len(indices)
+        self.log_transitions(indices, INFECTED, sources)
+        self.infected_start[indices] = self.clock()
+        self.infected_end[indices] = np.nan
+        self.last_event[indices] = np.maximum(0, self.clock() - self.infection.random(count)*5)
+        self.state[indices] = INFECTED
+        self.distancing[indices] = (self.infection.random(count)
+                                    <= objects.INFECTED_DISTANCER_CHANCE)
+
+    def end_infection(self, indices: np.ndarray):
+        """Decide whether each person recovers or dies according to mortality chance."""
+        count = len(indices)
+        self.infected_end[indices] = self.clock()
+        dies = self.infection.random(count) <= objects.MORTALITY_CHANCE
+        self.log_transitions(indices, np.where(dies, DECEASED, RECOVERED))
+        self.state[indices] = np.where(dies, DECEASED, RECOVERED)
+        recovered = indices[~dies]
+        self.distancing[recovered] = (self.infection.random(len(recovered))
+                                      <= objects.RECOVERED_NONDISTANCER_CHANCE)
+
+    def randomize_distancing(self):
+        """Randomize which people social distance based on the variable."""
+        self.distancing[:] = (self.actions.random(self.count)
+                              <= self.distancing_percent.value/100)
+
+    def start_traveling(self, indices: np.ndarray, targets: np.ndarray):
+        """Assign communities for people to travel towards."""
+        self.travel_target[indices] = targets
+
+    def step(self, frametime: float):
+        """Advance every person by one frame, then handle infection events that are due."""
+        self.clock.advance(frametime)
+        self.previous_position[:] = self.position
+        alive = self.state != DECEASED
+        traveling = alive & (self.travel_target != NO_TARGET)
+        operating = np.flatnonzero(alive & ~traveling)
+        self.travel(np.flatnonzero(traveling), frametime)
+        bounds = self.active_bounds(operating)
+        self.turn(operating)
+        self.avoid_walls(operating, bounds)
+        if self.distancing_toggle is not None and self.distancing_toggle.value:
+            self.social_distance(operating)
+        self.position[operating] += self.direction[operating] * self.speed * frametime
+        self.stay_in_bounds(operating, bounds)
+        self.handle_infection(operating)
+
+    def travel(self, indices: np.ndarray, frametime: float):
+        """Ignore standard operation and navigate towards target communities."""
+        if not len(indices):
+            return
+        targets = self.travel_target[indices]
+        to_target = self.community_centers[targets] - self.position[indices]
+        moving = np.hypot(to_target[:, 0], to_target[:, 1]) > 0
+        self.direction[indices[moving]] = normalize(to_target[moving])
+        self.position[indices] += (self.direction[indices] * self.speed
+                                   * objects.TRAVEL_SPEED_MULTIPLIER * frametime)
+        rects, positions = self.community_center_rects[targets], self.position[indices]
+        arrived = ((rects[:, 0] <= positions[:, 0]) & (positions[:, 0] < rects[:, 2])
+                   & (rects[:, 1] <= positions[:, 1]) & (positions[:, 1] < rects[:, 3]))
+        self.community[indices[arrived]] = targets[arrived]
+        self.travel_target[indices[arrived]] = NO_TARGET
+
+    def turn(self, indices: np.ndarray):
+        """Randomly jitter headings."""
+        turning = indices[self.movement.random(len(indices)) < 0.5]
+        self.direction[turning] = rotate(self.direction[turning],
+                                         self.movement.integers(-10, 10, len(turning),
+                                                                endpoint=True))
+
+    def avoid_walls(self, indices: np.ndarray, bounds: np.ndarray):
+        """Change people's direction when they encounter a wall."""
+        positions = self.position[indices]
+        near = np.abs(np.column_stack((positions[:, 0] - bounds[:, 0],
+                                       positions[:, 0] - bounds[:, 2],
+                                       positions[:, 1] - bounds[:, 1],
+                                       positions[:, 1] - bounds[:, 3]))) < 10
+        adjusted = near.any(axis=1)
+        wall = np.argmax(near, axis=1)  # first wall hit, matching `Person.avoid_walls`
+        headings = np.array(((1, 0), (-1, 0), (0, 1), (0, -1)), dtype=np.float64)
+        self.direction[indices[adjusted]] = headings[wall[adjusted]]
+        bouncing = indices[adjusted][self.movement.random(int(adjusted.sum())) < 0.5]
+        self.direction[bouncing] = rotate(self.direction[bouncing],
+                                          self.movement.integers(-80, 80, len(bouncing),
+                                                                 endpoint=True))
+
+    def social_distance(self, indices: np.ndarray):
+        """Turn distancing people away from those nearby in the same bounds."""
+        distancers = indices[self.distancing[indices]]
+        others = np.flatnonzero((self.state != DECEASED) & (self.travel_target == NO_TARGET))
+        active = self.active_index()
+        pushed = np.zeros(len(distancers), dtype=np.intp)
+        forces = np.zeros((len(distancers), 2))
+        for agents, neighbors in neighbor_blocks(self.position, distancers, others,
+                                                 self.distancing_radius, DISTANCING_BLOCK):
+            same_bounds = active[agents] == active[neighbors]
+            agents, neighbors = agents[same_bounds], neighbors[same_bounds]
+            block_pushed, block_forces = repulsion_sums(
+                np.searchsorted(distancers, agents),
+                self.position[agents] - self.position[neighbors],
+                self.distancing_radius, len(distancers))
+            pushed += block_pushed
+            forces += block_forces
+        self.direction[distancers] = steer(self.direction[distancers], pushed, forces,
+                                           self.distancing_strength.value)
+
+    def handle_infection(self, indices: np.ndarray):
+        """Handle infection events for infected people in standard operation."""
+        now = self.clock()
+        infected = indices[self.state[indices] == INFECTED]
+        expired = (now - self.infected_start[infected]) >= objects.MAX_INFECTION_DURATION
+        self.end_infection(infected[expired])
+        infected = infected[~expired]
+        due = infected[(now - self.last_event[infected]) >= objects.INFECTION_EVENT_INTERVAL]
+        spreading = due[self.infection.random(len(due)) < objects.SPREAD_CHANCE]
+        self.spread(spreading)
+        terminating = self.infection.random(len(due)) < objects.EARLY_TERMINATION_CHANCE
+        self.end_infection(due[terminating])
+        self.last_event[due] = now
+
+    def spread(self, spreaders: np.ndarray):
+        """Attempt to transmit the infection from each spreader to people in range."""
+        if not len(spreaders):
+            return
+        exposed = np.flatnonzero((self.state != DECEASED)
+                                 & (self.travel_target == NO_TARGET))
+        sources, targets = neighbor_pairs(self.position, spreaders, exposed,
+                                          self.infection_radius)
+        active = self.active_index()
+        same_bounds = active[sources] == active[targets]
+        sources, targets = sources[same_bounds], targets[same_bounds]
+        chances = np.select((self.state[targets] == SUSCEPTIBLE,
+                             self.state[targets] == RECOVERED),
+                            (objects.INFECTION_CHANCE, objects.REINFECTION_CHANCE), 0.0)
+        self.infect(*transmit(sources, targets, self.position[sources]-self.position[targets],
+                              chances, self.infection_radius, self.infection))
+
+    def stay_in_bounds(self, indices: np.ndarray, bounds: np.ndarray):
+        """Force people's locations to stay within active bounds."""
+        self.position[indices] = np.clip(self.position[indices],
+                                         bounds[:, :2] + self.radius,
+                                         bounds[:, 2:] - self.radius)
@@ -0,0 +1,118 @@
+"""Per-phase timing of the main loop."""
+# pylint: disable=no-member
+from __future__ import annotations
+from array import array
+from collections import deque
+from contextlib import contextmanager
+import csv
+import json
+import os
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator
+
+import numpy as np
+import pygame
+
+from controls import get_font, TEXT_COLOR
+
+
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    """Time named phases of each frame.
+
+    Wrap each phase of a frame in `phase(name)` and call `end_frame()` once the frame
+    is done. Rolling p50/p95/p99 timings over the last `window` frames feed an
+    overlay. With `trace` set, every frame is also kept in a columnar trace that
+    `write_trace` exports; it grows for as long as the program runs, so leave it off
+    unless the trace will be written.
+    """
+    background_color = (0, 0, 0, 192)
+    slow_color = (255, 128, 0)
+    slow_share = 0.5  # highlight phases taking over half the frame budget at p95
+
+    def __init__(self, window: int = 600, refresh: int = 30, budget: float = 1/60,
+                 trace: bool = False):
+        self.window = window
+        self.refresh = refresh
+        self.budget = budget
+        self.current: dict[str, float] = {}
+        self.recent: dict[str, deque[float]] = {}
+        self.trace: dict[str, array] | None = {} if trace else None
+        self.frames = 0
+        self.overlay: pygame.Surface | None = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as part of phase `name` of the current frame."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] = self.current.get(name, 0.0) + perf_counter() - start
+
+    def end_frame(self):
+        """Close the current frame, adding its phase timings to the history and trace."""
+        self.current["frame"] = sum(self.current.values())
+        for name in self.current:
+            if name not in self.recent:
+                self.recent[name] = deque(maxlen=self.window)
+                if self.trace is not None:  # phases first seen mid-run read zero before
+                    self.trace[name] = array("d", bytes(8*self.frames))
+        for name, durations in self.recent.items():
+            durations.append(self.current.get(name, 0.0))
+        if self.trace is not None:
+            for name, column in self.trace.items():
+                column.append(self.current.get(name, 0.0))
+        self.frames += 1
+        self.current = {}
+        if self.frames % self.refresh == 0:
+            self.overlay = None
+
+    def percentiles(self) -> dict[str, tuple[float, ...]]:
+        """Rolling p50/p95/p99 of each phase in seconds."""
+        return {name: tuple(map(float, np.percentile(np.fromiter(durations, np.float64),
+                                                     PERCENTILES)))
+                for name, durations in self.recent.items() if durations}
+
+    def get_overlay(self) -> pygame.Surface:
+        """Table of rolling percentiles in milliseconds, redrawn every `refresh` frames."""
+        if self.overlay is None:
+            font = get_font()
+            rows = [("phase", *(f"p{percentile}" for percentile in PERCENTILES))]
+            colors = [TEXT_COLOR]
+            for name, values in self.percentiles().items():
+                rows.append((name, *(f"{1000*value:.2f}" for value in values)))
+                colors.append(self.slow_color if name != "frame"
+                              and values[1] > self.budget*self.slow_share else TEXT_COLOR)
+            name_width = max(font.size(row[0])[0] for row in rows) + 20
+            column_width = font.size("000.00")[0] + 20
+            line_height = font.get_linesize()
+            self.overlay = pygame.Surface(
+                (name_width + column_width*len(PERCENTILES) + 20, line_height*len(rows) + 20),
+                pygame.SRCALPHA)
+            self.overlay.fill(self.background_color)
+            for i, (row, color) in enumerate(zip(rows, colors)):
+                for j, text in enumerate(row):
+                    label = font.render(text, True, color)
+                    x = 10 + (name_width + column_width*j - label.get_width() if j else 0)
+                    self.overlay.blit(label, (x, 10 + line_height*i))
+        return self.overlay
+
+    def write_trace(self, path: str | os.PathLike):
+        """Write every frame's phase timings, as JSON columns if `path` ends in .json
+        and as CSV rows otherwise."""
+        if self.trace is None:
+            raise RuntimeError("Profiler was created without a trace")
+        path = Path(path)
+        if path.suffix.lower() == ".json":
+            path.write_text(json.dumps({"frames": self.frames,
+                                        **{name: column.tolist()
+                                           for name, column in self.trace.items()}}))
+            return
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(("frame_index", *self.trace))
+            writer.writerows((i, *row) for i, row in enumerate(zip(*self.trace.values())))
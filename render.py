@@ -0,0 +1,209 @@
+"""Batched drawing of the population and cached drawing of the static layout."""
+# pylint: disable=no-member
+from __future__ import annotations
+from typing import Iterable, Sequence
+
+import numpy as np
+import pygame
+
+from controls import Variable
+from objects import Community, Person, Region
+from population import STATES, Population
+
+
+class PopulationRenderer:
+    """Draw every person and their overlays onto one layer in a single pass.
+
+    Reads positions and per-frame flags straight from each `Person`, so no person
+    needs a surface of their own. Lines are drawn first. Translucent spread circles and
+    distancing rings are then blended over them from pre-drawn stamps, as `pygame.draw`
+    would replace the pixels underneath, and people are stamped on top; each stamping
+    is one `blits` call. `draw_population` does the same for a vectorized `Population`,
+    which keeps no per-frame flags, so it draws people without overlays.
+    """
+    travel_color = (255, 255, 0)
+    direction_color = (0, 255, 255)
+    spread_color = (255, 0, 0, 64)
+    distancing_color = (255, 255, 255, 64)
+    line_length = 20
+    max_dirty_rects = 256  # beyond this, the dirty area is one rect around all people
+
+    def __init__(self, area: pygame.Rect):
+        self.area = area.copy()
+        self.layer = pygame.Surface(self.area.size, pygame.SRCALPHA)
+        self.stamps: dict[tuple[int, int, int], pygame.Surface] = {}
+        self.spread_stamp = self.ring_stamp(self.spread_color, Person.infection_radius, 0)
+        self.distancing_stamp = self.ring_stamp(self.distancing_color, Person.radius*3, 1)
+        self.drawn: list[pygame.Rect] = []  # screen areas drawn in the last frame
+        self.dirty: list[pygame.Rect] = []  # screen areas changed by the last frame
+
+    def get_stamp(self, color: tuple[int, int, int]) -> pygame.Surface:
+        """Get a pre-drawn person circle of a color."""
+        if (stamp := self.stamps.get(color)) is None:
+            size = 2*Person.radius + 1
+            stamp = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.circle(stamp, color, (Person.radius, Person.radius), Person.radius)
+            self.stamps[color] = stamp
+        return stamp
+
+    @staticmethod
+    def ring_stamp(color: tuple[int, int, int, int], radius: int,
+                   width: int) -> pygame.Surface:
+        """Pre-draw a circle, or a ring when `width` is set, for blending onto the layer."""
+        stamp = pygame.Surface((2*radius + 1, 2*radius + 1), pygame.SRCALPHA)
+        pygame.draw.circle(stamp, color, (radius, radius), radius, width=width)
+        return stamp
+
+    def draw(self, persons: Iterable[Person], alpha: float,
+             direction_toggle: Variable, network_toggle: Variable):
+        """Redraw the layer with every person, interpolated between simulation steps."""
+        layer = self.layer
+        layer.fill((0, 0, 0, 0))
+        left, top = self.area.topleft
+        overlays: list[tuple[pygame.Surface, tuple[int, int]]] = []
+        people: list[tuple[pygame.Surface, tuple[int, int]]] = []
+        drawn: list[pygame.Rect] = []
+        for person in persons:
+            x, y = person.interpolate(alpha)
+            center = pygame.Vector2(x-left, y-top)
+            extent = person.radius  # furthest anything is drawn from the person's center
+            if person.traveling:
+                pygame.draw.line(layer, self.travel_color, center,
+                                 center + person.direction*self.line_length)
+                extent = max(extent, self.line_length)
+            if person.spreading:
+                overlays.append((self.spread_stamp, (x-left-person.infection_radius,
+                                                     y-top-person.infection_radius)))
+                extent = max(extent, person.infection_radius)
+            if person.distanced:
+                overlays.append((self.distancing_stamp, (x-left-person.radius*3,
+                                                         y-top-person.radius*3)))
+                extent = max(extent, person.radius*3)
+            if person.nears is not None:
+                if network_toggle.value:
+                    self.draw_network(person, center)
+                    extent = max(extent, person.distancing_radius//2)
+                if direction_toggle.value:
+                    pygame.draw.line(layer, self.direction_color, center,
+                                     center + person.direction*self.line_length)
+                    extent = max(extent, self.line_length)
+            people.append((self.get_stamp(person.color),
+                           (x-left-person.radius, y-top-person.radius)))
+            drawn.append(pygame.Rect(x-extent-1, y-extent-1, 2*extent+3, 2*extent+3))
+        layer.blits(overlays, doreturn=False)
+        layer.blits(people, doreturn=False)
+        self.dirty = self.merge(drawn + self.drawn)
+        self.drawn = drawn
+
+    def draw_population(self, population: Population, alpha: float):
+        """Redraw the layer with every agent of a population, interpolated between
+        simulation steps."""
+        self.layer.fill((0, 0, 0, 0))
+        previous = population.previous_position
+        centers = previous + (population.position-previous)*alpha
+        corners = np.rint(centers - (self.area.left + Person.radius,
+                                     self.area.top + Person.radius)).astype(np.int64)
+        stamps = [self.get_stamp(state.value) for state in STATES]
+        self.layer.blits(list(zip([stamps[state] for state in population.state.tolist()],
+                                  corners.tolist())), doreturn=False)
+        self.dirty, self.drawn = [self.area.copy()], []
+
+    def merge(self, rects: list[pygame.Rect]) -> list[pygame.Rect]:
+        """Clip rects to the area, combining them into one when there are too many."""
+        if len(rects) > self.max_dirty_rects:
+            rects = [rects[0].unionall(rects[1:])]
+        return [rect.clip(self.area) for rect in rects]
+
+    def draw_network(self, person: Person, center: pygame.Vector2):
+        """Draw half-length lines towards each nearby person, colored by proximity."""
+        if not person.nears:
+            return
+        offsets = (np.array([other.rect.center for other in person.nears], dtype=np.float64)
+                   - person.rect.center)
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        offsets, distances = offsets[distances > 0], distances[distances > 0]
+        intensities = person.get_intensities(distances, person.distancing_radius)
+        colors = np.column_stack((person.gradient.get_colors(intensities), intensities))
+        for (dx, dy), color in zip((offsets/2).tolist(), colors.tolist()):
+            pygame.draw.line(self.layer, color, center, (center.x+dx, center.y+dy))
+
+
+class StaticLayer:
+    """Background, regions and communities pre-rendered onto one screen-sized surface.
+
+    The layout only changes when communities are shown or hidden, or when the screen
+    is resized, so it is redrawn then and reused as-is on every other frame.
+    """
+    def __init__(self, size: tuple[int, int], regions: Sequence[Region],
+                 communities: Sequence[Community], communities_toggle: Variable,
+                 background_color: tuple[int, int, int] = (0, 0, 0)):
+        self.surf = pygame.Surface(size)
+        self.regions = regions
+        self.communities = communities
+        self.communities_toggle = communities_toggle
+        self.background_color = background_color
+        self.rendered_with: bool | None = None  # communities toggle at last render
+
+    def resize(self, size: tuple[int, int]):
+        """Use a surface of a new size, redrawing it on next use."""
+        self.surf = pygame.Surface(size)
+        self.invalidate()
+
+    def invalidate(self):
+        """Redraw the layer on next use."""
+        self.rendered_with = None
+
+    def get(self) -> pygame.Surface:
+        """Get the layer, redrawing it first if the layout has changed."""
+        if self.rendered_with is not self.communities_toggle.value:
+            self.surf.fill(self.background_color)
+            shown = ([*self.regions, *self.communities] if self.communities_toggle.value
+                     else self.regions)
+            for region in shown:
+                region.update()
+                self.surf.blit(region.surf, region.rect)
+            self.rendered_with = self.communities_toggle.value
+        return self.surf
+
+
+class DirtyRects:
+    """Screen areas to present this frame, so unchanged parts of the display are skipped.
+
+    Elements report where they changed with `add`, or use `track` to be compared with
+    how they were last drawn. Anything that moved is dirty both where it is now and
+    where it was, so its old position is cleared. Disabled, for displays that present
+    the whole screen regardless, nothing is collected.
+    """
+    def __init__(self, screen_rect: pygame.Rect, enabled: bool = True):
+        self.screen_rect = screen_rect.copy()
+        self.enabled = enabled
+        self.rects: list[pygame.Rect] = []
+        self.drawn: dict[object, tuple[pygame.Rect, object]] = {}
+        self.full = True  # present the whole screen next
+
+    def invalidate(self):
+        """Present the whole screen next."""
+        self.full = True
+
+    def add(self, *rects: pygame.Rect):
+        """Mark areas of the screen as changed."""
+        if self.enabled:
+            self.rects.extend(rects)
+
+    def track(self, key: object, rect: pygame.Rect, state: object = None):
+        """Mark an element as changed if its area or state differs from when it was
+        last drawn under `key`."""
+        if not self.enabled:
+            return
+        if (previous := self.drawn.get(key)) != (rect, state):
+            self.rects.append(rect)
+            if previous is not None:
+                self.rects.append(previous[0])
+            self.drawn[key] = (rect.copy(), state)
+
+    def pop(self) -> list[pygame.Rect]:
+        """Get the areas to present and start collecting the next frame's."""
+        rects = ([self.screen_rect] if self.full
+                 else [rect.clip(self.screen_rect) for rect in self.rects])
+        self.rects, self.full = [], False
+        return rects
@@ -0,0 +1,72 @@
+"""Seedable, independent random number streams for each part of the model."""
+from __future__ import annotations
+import random
+
+import numpy as np
+
+
+STREAMS = ("movement", "infection", "travel", "actions")
+
+
+class RandomStreams:
+    """One random stream per subsystem, all derived from a single seed.
+
+    Streams are independent, so drawing more numbers in one subsystem (say, extra
+    movement from a new person) never shifts the numbers seen by another. `movement`,
+    `infection`, `travel` and `actions` are `random.Random` instances; `generator`
+    gives a NumPy generator for a stream instead. `spawn` derives further independent
+    sets of streams, e.g. one per worker process.
+    """
+    def __init__(self, seed: int | np.random.SeedSequence | None = None):
+        self.seed_sequence = (seed if isinstance(seed, np.random.SeedSequence)
+                              else np.random.SeedSequence(seed))
+        self.sequences = dict(zip(STREAMS, self.seed_sequence.spawn(len(STREAMS))))
+        self.movement, self.infection, self.travel, self.actions = (
+            random.Random(int.from_bytes(self.sequences[name].generate_state(4).tobytes(),
+                                         "little"))
+            for name in STREAMS)
+
+    def generator(self, name: str) -> np.random.Generator:
+        """Get a new NumPy generator for a stream, independent of its `random.Random`.
+
+        Each call spawns a fresh child of the stream, so every generator returned for the
+        same name draws different numbers; create one per consumer and keep it.
+        """
+        return np.random.default_rng(self.sequences[name].spawn(1)[0])
+
+    def spawn(self, count: int) -> list[RandomStreams]:
+        """Derive independent sets of streams."""
+        return [RandomStreams(child) for child in self.seed_sequence.spawn(count)]
+
+    def getstate(self) -> dict[str, tuple]:
+        """Capture the position of every `random.Random` stream."""
+        return {name: getattr(self, name).getstate() for name in STREAMS}
+
+    def setstate(self, state: dict[str, tuple]):
+        """Return every `random.Random` stream to a captured position."""
+        for name, stream_state in state.items():
+            getattr(self, name).setstate(stream_state)
+
+
+class DrawPool:
+    """Uniform draws for one step of the per-person loop, generated as a block.
+
+    `refill(count)` draws a row per person: `movement` uniforms from the movement stream
+    followed by `infection` uniforms from the infection stream, which is left untouched
+    when there are none. The loop hands row `i` to its `i`th person, so each draw in the
+    hot path is a list index rather than a call into `random`.
+    """
+    def __init__(self, streams: RandomStreams, movement: int, infection: int):
+        self.movement = streams.generator("movement")
+        self.infection = streams.generator("infection")
+        self.columns = (movement, infection)
+        self.rows: list[list[float]] = []
+
+    def refill(self, count: int) -> list[list[float]]:
+        """Draw fresh rows for `count` people."""
+        movement, infection = self.columns
+        rows = self.movement.random((count, movement))
+        if infection:
+            rows = np.hstack((rows, self.infection.random((count, infection))))
+        self.rows = rows.tolist()
+        return self.rows
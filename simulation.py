@@ -0,0 +1,371 @@
+"""Display-independent model state, actions and headless execution."""
+# pylint: disable=invalid-name
+from __future__ import annotations
+from contextlib import contextmanager
+from itertools import cycle
+from typing import Iterator
+
+import numpy as np
+import pygame
+
+from clock import SimulationClock
+from controls import BooleanVariable, NumericVariable, Variable
+from eventlog import EventLog
+import objects
+import population
+from objects import (Region, Community, Bounds, InfectionScheduler, Person, PersonGroup,
+                     MOVEMENT_DRAWS)
+from region import RegionBlueprint, resolve_regions
+from rng import DrawPool, RandomStreams
+from spatial import SpatialHash
+
+
+SCREEN_WIDTH, SCREEN_HEIGHT = (1920, 1080)
+SETTINGS_WIDTH = 450
+DEFAULT_PERSON_COUNT = 200
+
+
+def set_up_regions(
+        new_regions: list[RegionBlueprint]
+        ) -> tuple[pygame.sprite.Group, dict[str, Region]]:
+    """Generate and organize regions in pygame."""
+    regions, region_dict = pygame.sprite.Group(), {}
+    for blueprint in new_regions:
+        region = Region(blueprint.size, blueprint.center, blueprint.label)
+        regions.add(region)
+        region_dict[blueprint.label] = region
+    return (regions, region_dict)
+
+def set_up_communities(new_communities: list[RegionBlueprint],
+                       x_offset: int) -> tuple[pygame.sprite.Group, dict[str, Community]]:
+    """Generate and organize communities in pygame."""
+    communities, community_dict = pygame.sprite.Group(), {}
+    for blueprint in new_communities:
+        center = (blueprint.center[0]+10+x_offset, blueprint.center[1]+10)
+        community = Community(blueprint.size, center, blueprint.label)
+        communities.add(community)
+        community_dict[blueprint.label] = community
+    return (communities, community_dict)
+
+def set_up_layout(
+        resolution: tuple[int, int] = (SCREEN_WIDTH, SCREEN_HEIGHT),
+        settings_width: int = SETTINGS_WIDTH
+        ) -> tuple[pygame.sprite.Group, dict[str, Region],
+                   pygame.sprite.Group, dict[str, Community]]:
+    """Divide screenspace into field and settings regions, with 4 communities in the field."""
+    new_regions: list[RegionBlueprint] = resolve_regions(
+        resolution,
+        ((resolution[0]-settings_width, "Field"), (settings_width, "Settings")),
+        border_thickness=10
+        )
+    regions, region_dict = set_up_regions(new_regions)
+    field = region_dict["Field"]
+    # create a square of maximum size centered in the field
+    field_square_width: int = field.size[1]
+    field_square_x_offset = int((field.size[0]-field.size[1])/2)
+    # split into 4 squares
+    new_communities: list[RegionBlueprint] = resolve_regions(
+        (field_square_width, field_square_width),
+        ((field_square_width // 2,
+          ((field_square_width // 2, "TL"), (field_square_width // 2, "BL"))),
+         (field_square_width // 2,
+          ((field_square_width // 2, "TR"), (field_square_width // 2, "BR")))),
+        border_thickness=10
+        )
+    communities, community_dict = set_up_communities(new_communities, field_square_x_offset)
+    return (regions, region_dict, communities, community_dict)
+
+
+class Simulation:
+    """Population, communities and the actions that can be taken on them."""
+    def __init__(self, field: Region, community_dict: dict[str, Community],
+                 distancing_percent: NumericVariable, distancing_strength: NumericVariable,
+                 distancing_toggle: Variable, communities_toggle: Variable,
+                 traveling_toggle: Variable, person_count: int = DEFAULT_PERSON_COUNT,
+                 event_log: EventLog | None = None, seed: int | None = None):
+        self.field = field
+        self.event_log = event_log
+        self.communities = list(community_dict.values())
+        self.destinations = {community: [other for other in self.communities
+                                         if other is not community]
+                             for community in self.communities}
+        self.community_cycler = cycle([community_dict[label]
+                                       for label in ("TL", "TR", "BR", "BL")])
+        self.distancing_percent = distancing_percent
+        self.distancing_strength = distancing_strength
+        self.distancing_toggle = distancing_toggle
+        self.communities_toggle = communities_toggle
+        self.traveling_toggle = traveling_toggle
+        self.persons = PersonGroup()
+        self.neighbors = SpatialHash(Person.distancing_radius)
+        self.clock = SimulationClock()
+        self.streams = RandomStreams(seed)
+        self.scheduler = InfectionScheduler(self.clock, self.streams)
+        # the scheduler draws for infection events in bulk, so rows only hold movement
+        self.draws = DrawPool(self.streams, MOVEMENT_DRAWS, infection=0)
+        self.last_travel = 0.0
+        self.add_people(person_count)
+
+    def add_person(self, community: Community | None = None,
+                   center: tuple[int, int] | None = None) -> Person:
+        """Add a person to a community, cycling through communities if none is given."""
+        person = Person(Bounds(community or next(self.community_cycler), self.field),
+                        distancing_percent=self.distancing_percent,
+                        distancing_strength=self.distancing_strength,
+                        clock=self.clock, center=center, event_log=self.event_log,
+                        scheduler=self.scheduler, streams=self.streams)
+        self.persons.add(person)
+        return person
+
+    def add_people(self, count: int):
+        """Add people, cycling through communities."""
+        for _ in range(count):
+            self.add_person()
+
+    def remove_people(self, count: int):
+        """Remove random people, cycling through communities when they are enabled."""
+        for _ in range(min(len(self.persons), count)):
+            if self.communities_toggle.value:
+                community = next(community for community in self.community_cycler
+                                 if self.persons.members.get(community))
+                remove_pool = self.persons.community_members(community)
+            else:
+                remove_pool = self.persons.sprites()
+            person = self.streams.actions.choice(remove_pool)
+            person.kill()
+
+    def infect_one(self):
+        """Infect a random susceptible or recovered person."""
+        infectible = [person for person in self.persons
+                      if person.state in {Person.State.SUSCEPTIBLE, Person.State.RECOVERED}]
+        if infectible:
+            person: Person = self.streams.actions.choice(infectible)
+            person.get_infected()
+
+    def randomize_distancers(self):
+        """Pick a new random set of distancers according to the distancing percent."""
+        for person in self.persons:
+            person.distancing = False
+        target = int(self.distancing_percent.value/100 * len(self.persons))
+        new_distancers = self.streams.actions.sample(self.persons.sprites(), k=target)
+        for person in new_distancers:
+            person.distancing = True
+
+    def adjust_distancing(self):
+        """Change the fewest people needed to match the distancing percent."""
+        target = int(self.distancing_percent.value/100 * len(self.persons))
+        distancers = [person for person in self.persons if person.distancing]
+        non_distancers = [person for person in self.persons if not person.distancing]
+        if (diff := target - len(distancers)):
+            population, distancing = ((non_distancers, True) if diff > 0
+                                      else (distancers, False))
+            change_distancing: list[Person] = self.streams.actions.sample(population,
+                                                                          k=abs(diff))
+            for person in change_distancing:
+                person.distancing = distancing
+        self.distancing_percent.resolve_diff()
+
+    def travel_one(self):
+        """Send a random person towards another community."""
+        if self.communities_toggle.value and self.traveling_toggle.value and self.persons:
+            person = self.streams.travel.choice(self.persons.sprites())
+            target_community: Community = self.streams.travel.choice(
+                self.destinations[person.community])
+            person.start_traveling(target_community)
+
+    def counts(self) -> dict[str, int]:
+        """Count people in each infection state."""
+        return self.persons.counts()
+
+    def distancers(self) -> int:
+        """Count people who social distance."""
+        return self.persons.distancers
+
+    def __len__(self) -> int:
+        return len(self.persons)
+
+    def step(self, frametime: float):
+        """Advance the model by one frame."""
+        self.clock.advance(frametime)
+        if self.clock() - self.last_travel >= objects.TRAVEL_INTERVAL:
+            self.travel_one()
+            self.last_travel = self.clock()
+        for community in self.communities:
+            community.active = self.communities_toggle.value
+        self.neighbors.rebuild(self.persons)
+        people: list[Person] = self.persons.sprites()  # type: ignore
+        for person, draws in zip(people, self.draws.refill(len(people))):
+            person.simulate(self.neighbors, frametime, self.distancing_toggle, draws)
+        self.scheduler.run()
+
+
+class ArraySimulation:
+    """The model and actions of `Simulation`, run on a vectorized `Population`.
+
+    Scales to far larger populations than `Person` sprites. A seed reproduces its runs,
+    but random numbers are drawn in a different order than by `Simulation`, so the two
+    engines agree in distribution rather than run for run.
+    """
+    def __init__(self, field: Region, community_dict: dict[str, Community],
+                 distancing_percent: NumericVariable, distancing_strength: NumericVariable,
+                 distancing_toggle: Variable, communities_toggle: Variable,
+                 traveling_toggle: Variable, person_count: int = DEFAULT_PERSON_COUNT,
+                 event_log: EventLog | None = None, seed: int | None = None):
+        self.field = field
+        self.communities = list(community_dict.values())
+        self.community_cycler = cycle([self.communities.index(community_dict[label])
+                                       for label in ("TL", "TR", "BR", "BL")])
+        self.distancing_percent = distancing_percent
+        self.communities_toggle = communities_toggle
+        self.traveling_toggle = traveling_toggle
+        self.clock = SimulationClock()
+        self.population = population.Population(
+            self.communities, field, distancing_percent, distancing_strength, self.clock,
+            seed, event_log, distancing_toggle)
+        self.streams = self.population.streams
+        self.actions = self.population.actions
+        self.travel_rng = self.streams.generator("travel")
+        self.last_travel = 0.0
+        self.add_people(person_count)
+
+    def add_person(self, community: Community | None = None,
+                   center: tuple[int, int] | None = None) -> int:
+        """Add a person to a community, cycling through communities if none is given.
+        Returns their index."""
+        index = (self.communities.index(community) if community is not None
+                 else next(self.community_cycler))
+        return int(self.population.add(1, index, None if center is None
+                                       else np.array([center], dtype=np.float64))[0])
+
+    def add_people(self, count: int):
+        """Add people, cycling through communities."""
+        self.population.add(count, np.array([next(self.community_cycler)
+                                             for _ in range(count)], dtype=np.int16))
+
+    def remove_people(self, count: int):
+        """Remove random people, cycling through communities when they are enabled."""
+        removed: list[int] = []
+        for _ in range(min(len(self.population), count)):
+            kept = np.ones(len(self.population), dtype=np.bool_)
+            kept[removed] = False
+            if self.communities_toggle.value:
+                pool = np.empty(0, dtype=np.intp)
+                while not len(pool):
+                    community = next(self.community_cycler)
+                    pool = np.flatnonzero(kept & (self.population.community == community))
+            else:
+                pool = np.flatnonzero(kept)
+            removed.append(int(self.actions.choice(pool)))
+        self.population.remove(np.array(removed, dtype=np.intp))
+
+    def infect_one(self):
+        """Infect a random susceptible or recovered person."""
+        states = self.population.state
+        infectible = np.flatnonzero((states == population.SUSCEPTIBLE)
+                                    | (states == population.RECOVERED))
+        if len(infectible):
+            self.population.infect(self.actions.choice(infectible, 1))
+
+    def randomize_distancers(self):
+        """Pick a new random set of distancers according to the distancing percent."""
+        count = len(self.population)
+        target = int(self.distancing_percent.value/100 * count)
+        self.population.distancing[:] = False
+        self.population.distancing[self.actions.choice(count, target, replace=False)] = True
+
+    def adjust_distancing(self):
+        """Change the fewest people needed to match the distancing percent."""
+        distancing = self.population.distancing
+        target = int(self.distancing_percent.value/100 * len(self.population))
+        if (diff := target - int(distancing.sum())):
+            pool = np.flatnonzero(~distancing if diff > 0 else distancing)
+            distancing[self.actions.choice(pool, abs(diff), replace=False)] = diff > 0
+        self.distancing_percent.resolve_diff()
+
+    def travel_one(self):
+        """Send a random person towards another community."""
+        if (self.communities_toggle.value and self.traveling_toggle.value
+                and len(self.population)):
+            index = int(self.travel_rng.integers(len(self.population)))
+            home = int(self.population.community[index])
+            targets = [other for other in range(len(self.communities)) if other != home]
+            self.population.start_traveling(np.array([index]),
+                                            np.array([self.travel_rng.choice(targets)]))
+
+    def counts(self) -> dict[str, int]:
+        """Count people in each infection state."""
+        return self.population.counts()
+
+    def distancers(self) -> int:
+        """Count people who social distance."""
+        return int(self.population.distancing.sum())
+
+    def __len__(self) -> int:
+        return len(self.population)
+
+    def step(self, frametime: float):
+        """Advance the model by one frame."""
+        for community in self.communities:
+            community.active = self.communities_toggle.value
+        self.population.step(frametime)
+        if self.clock() - self.last_travel >= objects.TRAVEL_INTERVAL:
+            self.travel_one()
+            self.last_travel = self.clock()
+
+
+ENGINES: dict[str, type[Simulation] | type[ArraySimulation]] = {
+    "sprites": Simulation, "arrays": ArraySimulation}
+
+
+@contextmanager
+def model_parameters(**values: float) -> Iterator[None]:
+    """Temporarily override model constants in `objects`, e.g. `SPREAD_CHANCE=0.5`."""
+    if (unknown := [name for name in values
+                    if not (name.isupper() and hasattr(objects, name))]):
+        raise ValueError(f"unknown model parameters: {', '.join(unknown)}")
+    previous = {name: getattr(objects, name) for name in values}
+    for name, value in values.items():
+        setattr(objects, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(objects, name, value)
+
+
+def run_headless(duration: float, frametime: float = 1/60,
+                 person_count: int = DEFAULT_PERSON_COUNT, initial_infected: int = 1,
+                 distancing: bool = False, distancing_percent: int | float = 100,
+                 distancing_strength: int | float = 1, communities: bool = True,
+                 traveling: bool = True, sample_interval: float = 1, seed: int | None = None,
+                 event_log: EventLog | None = None,
+                 engine: str = "sprites") -> dict[str, list[float]]:
+    """Run the model with no display and return sampled time series of state counts.
+
+    Time advances by `frametime` per step regardless of wall time, so runs are as fast
+    as the machine allows and a given `seed` reproduces the same series. `engine` picks
+    `Person` sprites ("sprites") or the vectorized population ("arrays") from `ENGINES`.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine: {engine}")
+    _, region_dict, _, community_dict = set_up_layout()
+    simulation = ENGINES[engine](region_dict["Field"], community_dict,
+                                 NumericVariable("distancing percent", distancing_percent),
+                                 NumericVariable("distancing strength", distancing_strength),
+                                 BooleanVariable("distancing", distancing),
+                                 BooleanVariable("communities", communities),
+                                 BooleanVariable("travel", traveling),
+                                 person_count, event_log, seed)
+    for _ in range(initial_infected):
+        simulation.infect_one()
+    series: dict[str, list[float]] = {"time": [], **{str(state): [] for state in Person.State}}
+    tolerance = frametime/1000  # keeps rounding in step times from shifting a sample
+    samples = 0
+    while (now := simulation.clock()) <= duration + tolerance:
+        if now >= samples*sample_interval - tolerance:
+            series["time"].append(round(now, 6))
+            for state, count in simulation.counts().items():
+                series[state].append(count)
+            samples += 1
+        simulation.step(frametime)
+    return series
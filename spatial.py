@@ -0,0 +1,69 @@
+"""Uniform-grid spatial hashing for proximity queries."""
+from __future__ import annotations
+from collections import defaultdict
+from typing import Iterable, Protocol
+
+import pygame
+
+
+class Locatable(Protocol):
+    """Anything with a rect that can be placed in a spatial hash."""
+    rect: pygame.Rect
+
+
+class SpatialHash:
+    """Bucket items into square cells so neighbors can be found in the 3x3 surrounding cells."""
+    def __init__(self, cell_size: int, items: Iterable[Locatable] = ()):
+        self.cell_size = cell_size
+        self.cells: defaultdict[tuple[int, int], list[Locatable]] = defaultdict(list)
+        self.locations: dict[Locatable, tuple[int, int]] = {}
+        self.order: dict[Locatable, int] = {}
+        self.next_order = 0
+        self.rebuild(items)
+
+    def cell_of(self, position: tuple[int, int]) -> tuple[int, int]:
+        """Get the cell key containing a position."""
+        return (position[0] // self.cell_size, position[1] // self.cell_size)
+
+    def rebuild(self, items: Iterable[Locatable]):
+        """Clear the hash and insert every item, remembering iteration order."""
+        self.cells.clear()
+        self.locations.clear()
+        self.order.clear()
+        self.next_order = 0
+        for item in items:
+            self.insert(item)
+
+    def insert(self, item: Locatable):
+        """Add an item to the cell containing its center."""
+        cell = self.cell_of(item.rect.center)
+        self.cells[cell].append(item)
+        self.locations[item] = cell
+        self.order[item] = self.next_order
+        self.next_order += 1
+
+    def remove(self, item: Locatable):
+        """Remove an item from the hash."""
+        cell = self.locations.pop(item)
+        self.cells[cell].remove(item)
+        self.order.pop(item, None)
+
+    def move(self, item: Locatable):
+        """Re-bucket an item after its position changed."""
+        cell = self.cell_of(item.rect.center)
+        if (old := self.locations.get(item)) == cell:
+            return
+        if old is not None:
+            self.cells[old].remove(item)
+        self.cells[cell].append(item)
+        self.locations[item] = cell
+
+    def query(self, position: tuple[int, int]) -> list[Locatable]:
+        """Get items in the 3x3 block of cells around a position, in insertion order."""
+        column, row = self.cell_of(position)
+        candidates = [item
+                      for x in (column-1, column, column+1)
+                      for y in (row-1, row, row+1)
+                      for item in self.cells.get((x, y), ())]
+        candidates.sort(key=self.order.__getitem__)
+        return candidates
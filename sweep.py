@@ -0,0 +1,174 @@
+"""Parameter sweeps over model constants with on-disk caching and resumption."""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+import hashlib
+import inspect
+from itertools import product
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+import numpy as np
+
+from ensemble import replicate_seeds, run_replicate
+from simulation import run_headless
+
+
+Point = dict[str, float]
+# `run_headless` arguments that only take whole numbers, rounded when sampled from ranges
+INTEGER_ARGUMENTS = frozenset(name for name, parameter
+                              in inspect.signature(run_headless).parameters.items()
+                              if parameter.annotation == "int")
+
+# Joe & Kuo (2008) primitive polynomials (degree, coefficients) and initial direction
+# numbers for Sobol dimensions 2 onwards; dimension 1 is the van der Corput sequence
+SOBOL_DIRECTIONS: tuple[tuple[int, int, tuple[int, ...]], ...] = (
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)),
+    (5, 14, (1, 3, 5, 5, 31)),
+    )
+SOBOL_BITS = 32
+
+
+def grid(space: dict[str, Sequence[float]]) -> list[Point]:
+    """Full factorial design over the listed values of each parameter."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in product(*space.values())]
+
+
+def scale(unit: np.ndarray, space: dict[str, tuple[float, float]]) -> list[Point]:
+    """Map points in the unit hypercube onto (low, high) ranges of each parameter,
+    rounding those in `INTEGER_ARGUMENTS`."""
+    lows = np.array([low for low, _ in space.values()], dtype=np.float64)
+    highs = np.array([high for _, high in space.values()], dtype=np.float64)
+    values = lows + unit*(highs-lows)
+    return [{name: round(value) if name in INTEGER_ARGUMENTS else value
+             for name, value in zip(space, row.tolist())} for row in values]
+
+
+def latin_hypercube(space: dict[str, tuple[float, float]], samples: int,
+                    seed: int | None = None) -> list[Point]:
+    """Latin hypercube design: each parameter's range is split into `samples` strata
+    and every stratum is sampled exactly once."""
+    rng = np.random.default_rng(seed)
+    unit = np.column_stack([(rng.permutation(samples) + rng.random(samples)) / samples
+                            for _ in space])
+    return scale(unit.reshape(samples, len(space)), space)
+
+
+def sobol_unit(samples: int, dimensions: int) -> np.ndarray:
+    """First `samples` points of the Sobol sequence in the unit hypercube."""
+    if dimensions > len(SOBOL_DIRECTIONS) + 1:
+        raise ValueError(f"Sobol designs support at most {len(SOBOL_DIRECTIONS) + 1} "
+                         "parameters")
+    directions = np.zeros((dimensions, SOBOL_BITS), dtype=np.uint64)
+    directions[0] = [1 << (SOBOL_BITS-1-bit) for bit in range(SOBOL_BITS)]
+    for dimension in range(1, dimensions):
+        degree, coefficients, initial = SOBOL_DIRECTIONS[dimension-1]
+        values = [m << (SOBOL_BITS-1-bit) for bit, m in enumerate(initial)]
+        for bit in range(degree, SOBOL_BITS):
+            value = values[bit-degree] ^ (values[bit-degree] >> degree)
+            for k in range(1, degree):
+                if (coefficients >> (degree-1-k)) & 1:
+                    value ^= values[bit-k]
+            values.append(value)
+        directions[dimension] = values[:SOBOL_BITS]
+    points = np.zeros((samples, dimensions), dtype=np.uint64)
+    current = np.zeros(dimensions, dtype=np.uint64)
+    for index in range(1, samples):
+        lowest_zero = (~(index-1) & index).bit_length() - 1  # rightmost zero bit of index-1
+        current ^= directions[:, lowest_zero]
+        points[index] = current
+    return points / float(1 << SOBOL_BITS)
+
+
+def sobol(space: dict[str, tuple[float, float]], samples: int) -> list[Point]:
+    """Sobol low-discrepancy design over (low, high) ranges of each parameter."""
+    return scale(sobol_unit(samples, len(space)), space)
+
+
+@dataclass(slots=True)
+class SweepRun:
+    """One replicate of one design point."""
+    point: int
+    parameters: Point
+    seed: int
+    series: dict[str, list[float]]
+
+
+def run_point(parameters: Point, seed: int, duration: float,
+              options: dict[str, Any]) -> dict[str, list[float]]:
+    """Run a design point in a worker. Upper-case names override model constants and
+    lower-case names are passed to `run_headless` alongside the sweep options."""
+    constants = {name: value for name, value in parameters.items() if name.isupper()}
+    arguments = {name: value for name, value in parameters.items() if not name.isupper()}
+    return run_replicate(0, seed, duration, constants, {**options, **arguments}).series
+
+
+class Sweep:
+    """Run every design point across worker processes, caching each finished run.
+
+    Each (point, replicate) run is stored as JSON in `cache_dir` under a key derived
+    from its parameters, seed, duration and options, so rerunning an interrupted
+    (or extended) sweep only computes what is missing.
+    """
+    def __init__(self, points: Sequence[Point], cache_dir: str | os.PathLike,
+                 duration: float, replicates: int = 1, seed: int = 0, **options):
+        self.points = list(points)
+        self.cache_dir = Path(cache_dir)
+        self.duration = duration
+        self.seeds = replicate_seeds(seed, replicates)
+        self.options = options
+
+    def path(self, parameters: Point, seed: int) -> Path:
+        """Location of the cached result for a run."""
+        description = json.dumps({"parameters": parameters, "seed": seed,
+                                  "duration": self.duration, "options": self.options},
+                                 sort_keys=True)
+        return self.cache_dir / f"{hashlib.sha256(description.encode()).hexdigest()[:20]}.json"
+
+    def runs(self) -> Iterator[tuple[int, Point, int, Path]]:
+        """Every (point index, parameters, seed, cache path) in the sweep."""
+        for index, parameters in enumerate(self.points):
+            for seed in self.seeds:
+                yield (index, parameters, seed, self.path(parameters, seed))
+
+    def pending(self) -> list[tuple[int, Point, int, Path]]:
+        """Runs without a cached result."""
+        return [run for run in self.runs() if not run[3].exists()]
+
+    def run(self, max_workers: int | None = None) -> Iterator[SweepRun]:
+        """Compute missing runs, yielding and caching each one as soon as it finishes."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if not (pending := self.pending()):
+            return
+        executor = ProcessPoolExecutor(max_workers)
+        try:
+            futures = {executor.submit(run_point, parameters, seed, self.duration,
+                                       self.options): (index, parameters, seed, path)
+                       for index, parameters, seed, path in pending}
+            for future in as_completed(futures):
+                index, parameters, seed, path = futures[future]
+                result = SweepRun(index, parameters, seed, future.result())
+                temporary = path.with_suffix(".tmp")
+                temporary.write_text(json.dumps(asdict(result)))
+                os.replace(temporary, path)  # atomic, so interrupted writes never count
+                yield result
+        finally:  # stopping early cancels runs that have not started
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def results(self) -> list[SweepRun]:
+        """Load every cached run of the sweep."""
+        return [SweepRun(**json.loads(path.read_text()))
+                for _, _, _, path in self.runs() if path.exists()]
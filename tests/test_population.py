@@ -0,0 +1,53 @@
+"""Tests for the vectorized population kernels."""
+from types import SimpleNamespace
+
+import numpy as np
+import pygame
+
+import population
+from objects import Person
+
+
+def scalar_heading(center, direction, others, radius, strength):
+    """Steer a single heading with `Person.social_distance`."""
+    person = SimpleNamespace(rect=pygame.Rect(center, (0, 0)),
+                             direction=pygame.Vector2(direction), distancing_radius=radius,
+                             distancing_strength=SimpleNamespace(value=strength))
+    Person.social_distance(person, [SimpleNamespace(rect=pygame.Rect(other, (0, 0)))
+                                     for other in others])
+    return tuple(person.direction)
+
+
+def test_repulsion_matches_social_distance():
+    rng = np.random.default_rng(0)
+    radius, strength = Person.distancing_radius, 0.7
+    centers = rng.integers(0, 400, (50, 2))
+    angles = rng.uniform(0, 2*np.pi, 50)
+    directions = np.column_stack((np.cos(angles), np.sin(angles)))
+    agents, differences, expected = [], [], []
+    for agent, (center, direction) in enumerate(zip(centers, directions)):
+        others = [other for other in centers
+                  if 0 < np.hypot(*(center - other)) < radius]
+        others.append(center)  # a neighbor on top of the agent exerts no force
+        agents.extend([agent]*len(others))
+        differences.extend(center - other for other in others)
+        expected.append(scalar_heading(tuple(center), tuple(direction), others, radius,
+                                       strength))
+    headings = population.repulsion(directions, np.array(agents),
+                                     np.array(differences, dtype=float), radius, strength)
+    np.testing.assert_allclose(headings, expected, atol=1e-12)
+
+
+def test_repulsion_keeps_cancelled_heading():
+    headings = population.repulsion(np.array([[1.0, 0.0]]), np.array([0]),
+                                    np.array([[-10.0, 0.0]]), Person.distancing_radius, 1.0)
+    np.testing.assert_array_equal(headings, [[1.0, 0.0]])
+    assert scalar_heading((0, 0), (1, 0), [(10, 0)], Person.distancing_radius, 1.0) == (1, 0)
+
+
+def test_repulsion_leaves_unpushed_headings():
+    directions = np.array([[0.6, 0.8], [1.0, 0.0]])
+    headings = population.repulsion(directions, np.array([1]), np.array([[0.0, 5.0]]),
+                                    Person.distancing_radius, 1.0)
+    np.testing.assert_array_equal(headings[0], directions[0])
+    assert np.isclose(np.hypot(*headings[1]), 1)
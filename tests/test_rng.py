@@ -0,0 +1,23 @@
+"""Tests for the seeded random streams."""
+from rng import RandomStreams
+
+
+def draws(streams, count=20):
+    """Draw from every stream of a set."""
+    return ([streams.movement.random() for _ in range(count)],
+            [streams.infection.random() for _ in range(count)],
+            list(streams.generator("travel").random(count)))
+
+
+def test_spawned_streams_reproduce():
+    first = [draws(child) for child in RandomStreams(7).spawn(3)]
+    second = [draws(child) for child in RandomStreams(7).spawn(3)]
+    assert first == second
+
+
+def test_spawned_streams_are_independent():
+    parent = RandomStreams(7)
+    children = [draws(child) for child in parent.spawn(3)]
+    children.append(draws(parent))
+    values = [value for child in children for stream in child for value in stream]
+    assert len(set(values)) == len(values)
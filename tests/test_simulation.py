@@ -0,0 +1,19 @@
+"""Tests for headless runs."""
+import pytest
+
+from simulation import ENGINES, run_headless
+
+
+def run(seed, engine="sprites"):
+    """Run long enough for infections to spread and people to recover."""
+    return run_headless(15, person_count=150, initial_infected=20, distancing=True,
+                        distancing_percent=50, seed=seed, engine=engine)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_run_headless_is_deterministic(engine):
+    assert run(1, engine) == run(1, engine)
+
+
+def test_run_headless_depends_on_seed():
+    assert run(1) != run(2)